@@ -0,0 +1,183 @@
+import argparse
+import os
+import tempfile
+import time
+import timeit
+import tracemalloc
+from datetime import datetime
+
+from checklog import Analyzer, analyze, readlog
+from genlog import generate
+from logreader import iterlog
+from timeparse import parse_timestamp, parse_timestamps
+
+
+def legacy_timeformat(str):
+    # timeformat as it was before timeparse, kept for comparison
+    str = str.replace("a.m.", "AM")
+    str = str.replace("p.m.", "PM")
+    str = str.replace("midnight", "12:00 AM")
+    str = str.replace("noon", "12:00 PM")
+    if str.find(":") == -1:
+        splited = str.split(" ")
+        splited[-2] += ":00"
+        str = " ".join(splited)
+    return datetime.strptime(str, "%b. %d, %Y, %I:%M %p")
+
+
+def legacy_dates(dates):
+    # the dates legacy_timeformat understands: dotted month abbreviations
+    # only, not "March" or "Sept." as genlog writes them
+    parsed = {}
+    for raw in set(dates):
+        try:
+            parsed[raw] = legacy_timeformat(raw)
+        except ValueError:
+            pass
+    return [raw for raw in dates if raw in parsed], parsed
+
+
+def sample_dates(filenames):
+    dates = []
+    for filename in filenames:
+        with open(filename, "r", encoding="utf-8") as file:
+            next(file)
+            dates += [line.rstrip().split("\t")[-1] for line in file]
+    return dates
+
+
+def report(name, rows, seconds, peak=None):
+    line = "%-28s %10.0f rows/sec" % (name, rows / seconds)
+    if peak is not None:
+        line += " %10.1f MiB peak" % (peak / (1 << 20))
+    print(line)
+
+
+def quiet(finding):
+    pass
+
+
+def measure(func):
+    # (seconds, peak traced bytes); tracing slows the code down, so the
+    # timing comes from a separate untraced run
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def bench_timeformat(dates, repeat=5):
+    print("timeformat: %d rows" % len(dates))
+    print("================================")
+    legacy, parsed = legacy_dates(dates)
+    for raw, date in parsed.items():
+        assert parse_timestamp(raw) == date, raw
+
+    def cold():
+        parse_timestamp.cache_clear()
+        for raw in dates:
+            parse_timestamp(raw)
+
+    cases = [
+        ("parse_timestamp (cold)", cold),
+        ("parse_timestamp (cached)", lambda: [parse_timestamp(raw) for raw in dates]),
+        ("parse_timestamps", lambda: parse_timestamps(dates)),
+    ]
+    for name, func in cases:
+        report(name, len(dates), min(timeit.repeat(func, number=1, repeat=repeat)))
+    if legacy:
+        # only timed on the rows it can parse
+        func = lambda: [legacy_timeformat(raw) for raw in legacy]
+        report(
+            "legacy timeformat",
+            len(legacy),
+            min(timeit.repeat(func, number=1, repeat=repeat)),
+        )
+
+
+def bench_checkers(filename):
+    # time spent in each check stage
+    analyzer = Analyzer(quiet)
+    spent = dict.fromkeys(analyzer.checks, 0.0)
+
+    def timed(name, func):
+        def wrapper(*args):
+            start = time.perf_counter()
+            func(*args)
+            spent[name] += time.perf_counter() - start
+
+        return wrapper
+
+    for name, stage in zip(analyzer.checks, analyzer.stages):
+        stage.feed = timed(name, stage.feed)
+    rows = 0
+    for current in iterlog(filename):
+        analyzer.feed(current)
+        rows += 1
+    analyzer.finish()
+    for name in analyzer.checks:
+        report("  check %s" % name, rows, spent[name] or 1e-9)
+
+
+def bench_log(filename):
+    dates = sample_dates([filename])
+    rows = len(dates)
+    print("%s: %d rows" % (filename, rows))
+    print("================================")
+    cases = [
+        ("readlog", lambda: readlog(filename)),
+        ("iterlog", lambda: sum(1 for _ in iterlog(filename))),
+        ("analyze", lambda: analyze(filename, quiet)),
+    ]
+    for name, func in cases:
+        report(name, rows, *measure(func))
+    bench_checkers(filename)
+    parse_timestamp.cache_clear()
+    report("parse_timestamps", rows, *measure(lambda: parse_timestamps(dates)))
+    legacy, _ = legacy_dates(dates)
+    if legacy and len(legacy) <= 100000:
+        report(
+            "legacy timeformat",
+            len(legacy),
+            *measure(lambda: list(map(legacy_timeformat, legacy)))
+        )
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the log pipeline.")
+    parser.add_argument("filenames", nargs="*")
+    parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[],
+        help="also benchmark generated logs of these sizes",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--phones", type=int, default=1)
+    args = parser.parse_args()
+
+    if not args.filenames and not args.rows:
+        # repeat the sample rows so timings are not dominated by noise
+        samples = ["sample_log", "sample_log2", "sample_log3"]
+        bench_timeformat(sample_dates(samples) * 200)
+        return
+    if args.filenames:
+        bench_timeformat(sample_dates(args.filenames))
+        print()
+    for filename in args.filenames:
+        bench_log(filename)
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            filename = os.path.join(tmp, "generated_%d" % rows)
+            generate(filename, rows, args.seed, args.phones)
+            bench_log(filename)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from logreader import column_batches, iterlog, iterlog_batches, to_columns
+from parallel import parse_parallel
+from utils import settings
+
+VERSION = 3
+
+
+def content_hash(filename):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filename, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fingerprint(filename):
+    # everything the parsed columns depend on
+    stat = os.stat(filename)
+    return {
+        "version": VERSION,
+        "path": os.path.abspath(filename),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": content_hash(filename),
+        "model": settings.DISTANCE_MODEL,
+        "ignore": repr(settings.IGNORE_COORD),
+    }
+
+
+def entry_name(key):
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+def entry_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path))
+
+
+def entries(cache_dir):
+    # (path, metadata) of every complete entry
+    if not os.path.isdir(cache_dir):
+        return
+    for entry in os.scandir(cache_dir):
+        if entry.name.startswith(".tmp"):
+            # being written by store(), maybe in another process
+            continue
+        try:
+            with open(os.path.join(entry.path, "meta.json")) as file:
+                yield entry.path, json.load(file)
+        except (OSError, ValueError):
+            continue
+
+
+def load(cache_dir, key):
+    # memory-mapped columns, or None on a miss
+    path = os.path.join(cache_dir, entry_name(key))
+    try:
+        with open(os.path.join(path, "meta.json")) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if meta["key"] != key:
+        return None
+    try:
+        # mark as recently used for eviction
+        os.utime(os.path.join(path, "meta.json"))
+        return {
+            name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+            for name in meta["columns"]
+        }
+    except FileNotFoundError:
+        # evicted by another process meanwhile
+        return None
+
+
+def store(cache_dir, key, columns):
+    os.makedirs(cache_dir, exist_ok=True)
+    # entries of older versions of the same log are stale now
+    for path, meta in entries(cache_dir):
+        if meta["key"]["path"] == key["path"]:
+            shutil.rmtree(path, ignore_errors=True)
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp")
+    for name, column in columns.items():
+        np.save(os.path.join(tmp, name + ".npy"), column)
+    with open(os.path.join(tmp, "meta.json"), "w") as file:
+        json.dump({"key": key, "columns": list(columns)}, file)
+    try:
+        os.rename(tmp, os.path.join(cache_dir, entry_name(key)))
+    except OSError:
+        # another process stored the same entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+    evict(cache_dir)
+
+
+def evict(cache_dir, max_size=None):
+    # drop least recently used entries until the cache fits in max_size bytes
+    max_size = settings.CACHE_SIZE if max_size is None else max_size
+    used = []
+    for path, _ in entries(cache_dir):
+        try:
+            mtime = os.path.getmtime(os.path.join(path, "meta.json"))
+            used.append((mtime, path, entry_size(path)))
+        except FileNotFoundError:
+            # removed by another process meanwhile
+            continue
+    used.sort()
+    total = sum(size for _, _, size in used)
+    for _, path, size in used:
+        if total <= max_size:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+
+
+def clear(cache_dir=None):
+    shutil.rmtree(cache_dir or settings.CACHE_DIR, ignore_errors=True)
+
+
+def iterlog_batches_cached(filename, batch_size=None, cache_dir=None, jobs=None):
+    # iterlog_batches() backed by a columnar sidecar in the cache directory,
+    # a miss is parsed by `jobs` processes when given
+    cache_dir = cache_dir or settings.CACHE_DIR
+    key = fingerprint(filename)
+    columns = load(cache_dir, key)
+    if columns is None and jobs:
+        columns = parse_parallel(filename, jobs)
+        if columns is not None:
+            store(cache_dir, key, columns)
+    if columns is not None:
+        yield from column_batches(columns, batch_size)
+        return
+
+    parts = []
+    for batch in iterlog_batches(filename, batch_size):
+        parts.append(to_columns(batch))
+        yield batch
+    if parts:
+        store(
+            cache_dir,
+            key,
+            {name: np.concatenate([part[name] for part in parts]) for name in parts[0]},
+        )
+
+
+def iterlog_cached(filename, batch_size=None, cache_dir=None, jobs=None):
+    for batch in iterlog_batches_cached(filename, batch_size, cache_dir, jobs):
+        yield from batch
+
+
+def columns_cached(filename, cache_dir=None, jobs=None):
+    # the whole log as to_columns() arrays, parsed only on a cache miss
+    cache_dir = cache_dir or settings.CACHE_DIR
+    key = fingerprint(filename)
+    columns = load(cache_dir, key)
+    if columns is None:
+        if jobs:
+            columns = parse_parallel(filename, jobs)
+        else:
+            records = list(iterlog(filename))
+            columns = to_columns(records) if records else None
+        if columns is not None:
+            store(cache_dir, key, columns)
+    return columns
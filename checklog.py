@@ -1,406 +1,440 @@
+import argparse
+import functools
+import multiprocessing
+import os
 import sys
-from ast import literal_eval
-from datetime import datetime
+from datetime import datetime, timezone
 
-import geopy.distance
 import pandas as pd
 
+import checkpoint
+import logreader
+import stages
+import timeindex
+import utils
+from cache import columns_cached, iterlog_cached
+from compressed import is_compressed
+from demux import analyze_devices
+from findings import SINKS, ConsoleSink, Finding, console
+from logreader import (
+    COLUMNS,
+    DERIVED,
+    column_batches,
+    follow_batches,
+    iterlog,
+    timeformat,
+    to_columns,
+)
+from parallel import parse_parallel
+from profiling import Profile
+from stages import STAGES, Analyzer, performance
+from status import STATUSES, UPLOAD_STATUSES
+from timeparse import EPOCH
 from utils import *
 
 
-def timeformat(str):
-    str = str.replace("a.m.", "AM")
-    str = str.replace("p.m.", "PM")
-    str = str.replace("midnight", "12:00 AM")
-    str = str.replace("noon", "12:00 PM")
-    # add :00 on the hour
-    if str.find(":") == -1:
-        splited = str.split(" ")
-        splited[-2] += ":00"
-        str = " ".join(splited)
-    return datetime.strptime(str, "%b. %d, %Y, %I:%M %p")
-
-
-def readlog(filename):
-    print("Reading: %s" % filename)
-    print("================================")
-
-    # Initialize, read data and do preprocessing
-    with open(filename, "r", encoding="utf-8") as file:
-        raw_data = [x.rstrip().split("\t") for x in file.readlines()]
-    logdata = pd.DataFrame(raw_data[1:])
-    logdata.columns = raw_data[0]
-    logdata = logdata[
-        [
-            "Log ID",
-            "Battery",
-            "Location(Lat,Lng)",
-            "Status",
-            "Upload Status",
-            "Date(UTC+0)",
-        ]
-    ]
-    # Convert Location format
-    logdata["Location(Lat,Lng)"] = logdata["Location(Lat,Lng)"].apply(
-        lambda x: literal_eval(x)
+def readlog(filename, jobs=None):
+    # whole log as one DataFrame, oldest record first, statuses by name
+    logdata = pd.DataFrame(
+        list(iter_records(filename, jobs=jobs)), columns=COLUMNS + DERIVED
     )
-    # Remove default location
-    logdata = logdata[~logdata["Location(Lat,Lng)"].isin(settings.IGNORE_COORD)]
-    # Convert log date to fit datetime object
-    logdata["Date(UTC+0)"] = logdata["Date(UTC+0)"].apply(timeformat)
-    # Remove percent sign for Battery
-    logdata["Battery"] = logdata["Battery"].apply(lambda str: int(str.replace("%", "")))
-    # Prevent duplicate checking
-    return logdata.iloc[::-1].reset_index().drop(["index"], axis=1)
-
-
-def is_in_table(table, last_elem):
-    for _, v in table.items():
-        if v["list"][-1]["Log ID"] == last_elem["Log ID"]:
-            return True
-    return False
-
-
-def table_insert(table, item):
-    for _, v in table.items():
-        # if out of range, not append
-        if (
-            time_delta(item["Date(UTC+0)"], v["time"]) < settings.IDLE_TIME
-        ):  # is within time range
-            v["list"].append(item)
-    if not is_in_table(table, item):
-        # create new loglist and insert to table
-        table[item["Log ID"]] = {"time": item["Date(UTC+0)"], "list": [item]}
-
-    return table
-
-
-def check_shouldnt_start(table):
-    shouldnt_start_running = True
-    # check every list in dict
-    for _, v in table.items():
-        time = time_delta(v["time"], v["list"][-1]["Date(UTC+0)"])
-        time = 1 if time == 0 else time  # prevent divide by zero
-        # calculate distance
-        dist = 0
-        for elem in range(1, len(v["list"])):
-            dist += geopy.distance.distance(
-                v["list"][elem]["Location(Lat,Lng)"],
-                v["list"][elem - 1]["Location(Lat,Lng)"],
-            ).miles
-
-        speed = dist / time
-        if speed >= settings.MOVE_SPEED:
-            # should start running
-            shouldnt_start_running = False
-
-        elif speed < settings.MOVE_SPEED:
-            # should not start running
-            shouldnt_start_running = True
-
-    # return last interval's status
-    return shouldnt_start_running, speed * 3600
-
-
-def check_shouldnt_stop(table):
-    should_stop_running = False
-    for _, v in table.items():
-        time = time_delta(v["time"], v["list"][-1]["Date(UTC+0)"])
-        time = 1 if time == 0 else time
-        dist = 0
-        for elem in range(1, len(v["list"])):
-            dist += geopy.distance.distance(
-                v["list"][elem]["Location(Lat,Lng)"],
-                v["list"][elem - 1]["Location(Lat,Lng)"],
-            ).miles
-        speed = dist / time
-        if speed < settings.MOVE_SPEED:
-            # should stop running
-            should_stop_running = True
-
-        elif speed >= settings.MOVE_SPEED:
-            should_stop_running = False
-
-    return should_stop_running, speed * 3600
-
-
-def check_should_stop(current, check_should_stop_list):
-    # add into running list
-    check_should_stop_list.add(current)
-    stop_pos, avg_speed = check_should_stop_list.summary()
-    return stop_pos, avg_speed
-
-
-def check_should_start(current, check_should_start_list):
-    check_should_start_list.add(current)
-    start_pos, avg_speed = check_should_start_list.summary()
-    return start_pos, avg_speed
-
-
-def perf_evaluate(perf_list):
-    # get last stop status position
-    for i in range(len(perf_list) - 1, -1, -1):
-        if perf_list[i]["Status"] not in settings.idle_state:
-            perf_list = perf_list[: i + 1]
-            break
-    # get idle time and total running time
-    start_idle = None
-    idle_time = 0
-    for i in range(1, len(perf_list)):
-        if (
-            perf_list[i - 1]["Status"] not in settings.idle_state
-            and perf_list[i]["Status"] in settings.idle_state
-        ):
-            start_idle = perf_list[i]
-
-        if (
-            start_idle is not None
-            and perf_list[i]["Status"] not in settings.idle_state
-            and perf_list[i - 1]["Status"] in settings.idle_state
-        ):
-            idle_time += time_delta(
-                perf_list[i - 1]["Date(UTC+0)"], start_idle["Date(UTC+0)"]
-            )
-            start_idle = None
-
-    total_run_time = time_delta(
-        perf_list[0]["Date(UTC+0)"], perf_list[-1]["Date(UTC+0)"]
+    for column, names in (("Status", STATUSES), ("Upload Status", UPLOAD_STATUSES)):
+        logdata[column] = pd.Categorical.from_codes(logdata[column], names)
+    return logdata
+
+
+def iter_records(filename, cache=False, jobs=None):
+    # records oldest first: from the cache, parsed by `jobs` processes, or
+    # streamed from the file
+    if cache:
+        return iterlog_cached(filename, jobs=jobs)
+    if jobs:
+        return (
+            current
+            for batch in column_batches(parse_parallel(filename, jobs))
+            for current in batch
+        )
+    return iterlog(filename)
+
+
+def read_columns(filename, cache=False, jobs=None):
+    # whole log as logreader.to_columns() arrays, None when it has no rows
+    if cache:
+        return columns_cached(filename, jobs=jobs)
+    if jobs:
+        return parse_parallel(filename, jobs)
+    records = list(iterlog(filename))
+    return to_columns(records) if records else None
+
+
+def analyze(
+    filename, report=console, cache=False, jobs=None, checks=None, columnar=False
+):
+    analyzer = Analyzer(report, checks)
+    if columnar:
+        columns = read_columns(filename, cache, jobs)
+        if columns is None:
+            analyzer.finish()
+        else:
+            analyzer.run_columns(columns)
+        return analyzer
+    for current in iter_records(filename, cache, jobs):
+        analyzer.feed(current)
+    analyzer.finish()
+    return analyzer
+
+
+def analyze_resumable(filename, checkpoint_path, report=console, checks=None):
+    analyzer = checkpoint.resume(filename, checkpoint_path, Analyzer(report, checks))
+    analyzer.finish()
+    return analyzer
+
+
+def analyze_range(filename, start, stop, report=console, checks=None):
+    # Rows from `start` up to `stop` seconds, read through the hour index.
+    # The LEAD_IN before `start` only fills the check windows: findings and
+    # performance are counted from `start` on.
+    analyzer = Analyzer(lambda finding: None, checks)
+    leading = True
+    for current in timeindex.iter_range(filename, start - settings.LEAD_IN, stop):
+        if leading and current.timestamp >= start:
+            leading = False
+            start_reporting(analyzer, report)
+        analyzer.feed(current)
+    if leading:
+        start_reporting(analyzer, report)
+    analyzer.finish()
+    return analyzer
+
+
+def start_reporting(analyzer, report):
+    analyzer.report = report
+    perf = analyzer.stage("perf")
+    if perf is not None:
+        perf.total_idle = perf.total_run = 0
+        perf.rebase()
+
+
+def follow(filename, checks=None, sink=None):
+    # keep the analyzer alive and feed it rows as they are appended
+    sink = sink or ConsoleSink()
+    analyzer = Analyzer(sink, checks)
+    try:
+        for batch in follow_batches(filename):
+            for current in batch:
+                analyzer.feed(current)
+            sink.flush()
+    except KeyboardInterrupt:
+        pass
+    analyzer.finish()
+    return analyzer
+
+
+def analyze_file(filename, cache=False, checks=None):
+    # pool worker: run one file, hand back its findings instead of printing
+    findings = []
+    try:
+        analyzer = analyze(filename, findings.append, cache, checks=checks)
+    except Exception as e:
+        return filename, findings, None, None, "%s: %s" % (type(e).__name__, e)
+    return filename, findings, analyzer.total_idle, analyzer.total_run, None
+
+
+def instrument(profile):
+    # hook the hot paths of this process into `profile`
+    profile.patch(logreader, "reversed_lines", "read", generator=True)
+    profile.patch(logreader, "parse_line", "parse")
+    profile.patch(
+        logreader,
+        "segment_distances",
+        "distance",
+        size=lambda lats, lngs, model=None: max(len(lats) - 1, 0),
     )
-    return idle_time, total_run_time
-
-
-def main():
-    if len(sys.argv) > 1:
-        logdata = readlog(sys.argv[1])
-    else:
-        # read default log file name
-        logdata = readlog(settings.filename)
-
-    # for checking should not start running
-    idle_list_table = {}
-    shouldnt_start_running = False
-
-    # for checking should not stop running
-    running_list_table = {}
-    should_stop_running = False
-
-    # for checking upload log
-    log_upload_timer = None
-    log_uploaded = False
-
-    # for checking should stop running when running
-    stop_pos = None
-    avg_speed_running = -1
-    check_should_stop_list = RunList()
-
-    # for checking should start running when idle
-    start_pos = None
-    avg_speed_idle = -1
-    check_should_start_list = IdleList()
-
-    # for performance evaluation
-    perf_eval = False
-    perf_list = []
-    inactive_time = 0
-    start_idle = None
-    total_idle = 0
-    total_run = 0
-
-    for i in range(len(logdata)):
-        prev = logdata.iloc[0] if i == 0 else logdata.iloc[i - 1]
-        current = logdata.iloc[i]
-
-        # ================= Check should not Start =================
-        if current["Status"] in settings.idle_state:
-            idle_list_table = table_insert(idle_list_table, current)
-
-        # status changed from idle to active, clear table and summary
-        if (
-            current["Status"] == "start_mobileinsight"
-            and prev["Status"] in settings.idle_state
-        ):
-            shouldnt_start_running, speed = check_shouldnt_start(idle_list_table)
-            idle_list_table = {}
-
-        # if start running, check if indeed should start
-        if (
-            current["Status"] == "start_mobileinsight"
-            and prev["Status"] in settings.idle_state  # prevent duplicate check
-            and shouldnt_start_running
-        ):
-            logger(
-                "START",
-                "Should "
-                + setcolor("RED", "NOT START")
-                + " at %s, Speed: %f miles/hr (during last hour)."
-                % (current["Log ID"], speed),
+    profile.patch(utils, "average_speed", "average_speed")
+    profile.patch(
+        stages, "check_shouldnt_start", "idle_window", size=lambda window: window.rows
+    )
+    profile.patch(
+        stages,
+        "check_shouldnt_stop",
+        "running_window",
+        size=lambda window: window.rows,
+    )
+    profile.patch(stages.Perf, "end", "perf_evaluate")
+    profile.patch(Analyzer, "feed", "feed")
+    profile.patch(
+        Analyzer,
+        "run_columns",
+        "run_columns",
+        size=lambda analyzer, columns: len(columns["date"]),
+    )
+    for name, stage in STAGES.items():
+        profile.patch(stage, "feed", "check." + name)
+        if hasattr(stage, "scan"):
+            profile.patch(stage, "scan", "scan." + name)
+
+
+def profiled_rows(profile):
+    # rows fed one at a time plus rows handed over as columns
+    _, columnar, _ = profile.sizes.get("run_columns", (0, 0, 0))
+    return profile.calls.get("feed", 0) + columnar
+
+
+def list_logs(paths):
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames += sorted(
+                os.path.join(path, name)
+                for name in os.listdir(path)
+                if not name.startswith(".") and os.path.isfile(os.path.join(path, name))
             )
-
-        # ================= Check should not stop =================
-        if current["Status"] in settings.running_state:
-            running_list_table = table_insert(running_list_table, current)
-
-        # status changed from running to stopped
-        if current["Status"] == "stop" and prev["Status"] in settings.running_state:
-            should_stop_running, speed = check_shouldnt_stop(running_list_table)
-            running_list_table = {}
-
-        if (
-            current["Status"] == "stop"
-            and prev["Status"] in settings.running_state  # prevent duplicate check
-            and not should_stop_running
+        else:
+            filenames.append(path)
+    return filenames
+
+
+def run_batch(filenames, jobs=None, chunksize=1, cache=False, checks=None, sink=None):
+    sink = sink or ConsoleSink()
+    fleet_idle = 0
+    fleet_run = 0
+    with multiprocessing.Pool(jobs) as pool:
+        for filename, findings, idle, run, error in pool.imap(
+            functools.partial(analyze_file, cache=cache, checks=checks),
+            filenames,
+            chunksize,
         ):
-            logger(
-                "STOP",
-                "Should "
-                + setcolor("RED", "NOT STOP")
-                + " at %s, Speed: %f miles/hr (during last hour)."
-                % (current["Log ID"], speed),
-            )
+            sink.source = filename
+            sink.banner("Reading: %s" % filename)
+            for finding in findings:
+                sink(finding)
+            if error is not None:
+                sink(Finding("error", detail=error))
+                continue
+            fleet_idle += idle
+            fleet_run += run
+    sink.source = None
+    sink.banner("Fleet: %d files" % len(filenames))
+    if checks is None or "perf" in checks:
+        sink(Finding("performance", value=performance(fleet_idle, fleet_run)))
+
+
+def run_devices(filename, jobs=None, checks=None, sink=None):
+    sink = sink or ConsoleSink()
+    fleet_idle = 0
+    fleet_run = 0
+    devices = analyze_devices(filename, jobs, checks)
+    for device in sorted(devices):
+        findings, idle, run, error = devices[device]
+        sink.source = device
+        sink.banner("Device: %s" % device)
+        for finding in findings:
+            sink(finding)
+        if error is not None:
+            sink(Finding("error", detail=error))
+            continue
+        fleet_idle += idle
+        fleet_run += run
+    sink.source = None
+    sink.banner("Fleet: %d devices" % len(devices))
+    if checks is None or "perf" in checks:
+        sink(Finding("performance", value=performance(fleet_idle, fleet_run)))
+
+
+def parse_checks(value):
+    checks = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in checks if name not in STAGES]
+    if unknown:
+        raise argparse.ArgumentTypeError("unknown check: %s" % ", ".join(unknown))
+    # keep the pipeline order whatever order they were given in
+    return [name for name in STAGES if name in checks]
+
+
+def parse_date(value):
+    # ISO date or date and time, UTC, as epoch seconds
+    try:
+        date = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("not an ISO date: %r" % value) from None
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return (date - EPOCH).total_seconds()
 
-        # ================= Check Upload after task_complete =================
-        if (
-            current["Status"] == "task_complete"
-        ):  # log should upload within "settings.UPLOAD_TIME" minutes
-            log_upload_timer = current
-            log_uploaded = False
 
-        if log_upload_timer is not None:
-            passed_time = time_delta(
-                current["Date(UTC+0)"], log_upload_timer["Date(UTC+0)"]
-            )
-            if (
-                current["Upload Status"] == "complete"
-                and passed_time < settings.UPLOAD_TIME
-            ):
-                log_uploaded = True
-
-            if (
-                passed_time >= settings.UPLOAD_TIME
-                or current["Status"] == "start_mobileinsight"  # a new task has started
-                or i == len(logdata) - 1  # end of log
-            ):
-                if not log_uploaded:
-                    logger(
-                        "UPLOAD",
-                        "Log was "
-                        + setcolor("RED", "NOT ")
-                        + "uploaded: %s" % log_upload_timer["Log ID"],
-                    )
-                # clear timer
-                log_upload_timer = None
-                log_uploaded = False
-
-        # TODO: battery check
-
-        # ================= Should start =================
-        if current["Status"] in settings.idle_state and start_pos is None:
-            start_pos, avg_speed_idle = check_should_start(
-                current, check_should_start_list
-            )
-
-        if start_pos is not None:
-            if (
-                current["Status"] == "start_mobileinsight"
-                and time_delta(current["Date(UTC+0)"], start_pos["Date(UTC+0)"])
-                < settings.TRIGGER_TIME
-            ):
-                check_should_start_list = IdleList()
-                start_pos = None
-            elif (
-                time_delta(current["Date(UTC+0)"], start_pos["Date(UTC+0)"])
-                >= settings.TRIGGER_TIME
-            ):
-                logger(
-                    "START",
-                    "Should "
-                    + setcolor("RED", "START")
-                    + " at %s, Speed: %f miles/hr (during last hour)."
-                    % (start_pos["Log ID"], avg_speed_idle),
-                )
-                check_should_start_list = IdleList()
-                start_pos = None
-
-        # ================= Should stop =================
-        if current["Status"] == "running" and stop_pos is None:
-            stop_pos, avg_speed_running = check_should_stop(
-                current, check_should_stop_list
+def main():
+    parser = argparse.ArgumentParser(description="Check device logs.")
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=[settings.filename],
+        help="log files or directories of log files",
+    )
+    parser.add_argument(
+        "-f",
+        "--follow",
+        action="store_true",
+        help="keep reading a live log as new rows are added below its header",
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="reuse parsed columns stored in %s" % settings.CACHE_DIR,
+    )
+    parser.add_argument(
+        "--checkpoint",
+        metavar="PATH",
+        help="resume from and save analyzer state to PATH (single log)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="worker processes for several logs (default: one per core)",
+    )
+    parser.add_argument(
+        "--parse-jobs",
+        type=int,
+        default=None,
+        help="processes parsing a single log in parallel",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=1,
+        help="logs handed to a worker at a time",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="write stage timings and hot-path counters as JSON to PATH",
+    )
+    parser.add_argument(
+        "--checks",
+        type=parse_checks,
+        default=None,
+        metavar="NAME[,NAME...]",
+        help="run only these checks: %s" % ", ".join(STAGES),
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="load the whole log as arrays and only visit rows where states change",
+    )
+    parser.add_argument(
+        "--from",
+        dest="start",
+        type=parse_date,
+        metavar="DATE",
+        help="analyze rows from DATE on (UTC, e.g. 2019-10-24 or 2019-10-24T06:00)",
+    )
+    parser.add_argument(
+        "--to",
+        dest="stop",
+        type=parse_date,
+        metavar="DATE",
+        help="analyze rows before DATE (UTC)",
+    )
+    parser.add_argument(
+        "--by-device",
+        action="store_true",
+        help="analyze every phone of a merged log separately (single log)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(SINKS),
+        default="console",
+        help="how findings are written (default: console)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        metavar="PATH",
+        help="write findings to PATH instead of stdout",
+    )
+    args = parser.parse_args()
+
+    filenames = list_logs(args.paths)
+    batch = not args.follow and (len(filenames) != 1 or args.jobs is not None)
+    batch = batch or args.by_device
+    if args.profile and batch:
+        parser.error("--profile takes a single log file")
+    ranged = args.start is not None or args.stop is not None
+    if ranged and (batch or args.follow):
+        parser.error("--from/--to take a single log file")
+    if args.checkpoint and (batch or ranged or args.follow):
+        parser.error(
+            "--checkpoint takes a single log file, without --from/--to or --follow"
+        )
+    if args.parse_jobs and (batch or ranged or args.follow or args.checkpoint):
+        parser.error(
+            "--parse-jobs takes a single log file, without --checkpoint, "
+            "--from/--to or --follow"
+        )
+    if args.columnar and (batch or ranged or args.follow or args.checkpoint):
+        parser.error(
+            "--columnar takes a single log file, without --checkpoint, "
+            "--from/--to or --follow"
+        )
+    if args.cache and (ranged or args.follow or args.checkpoint or args.by_device):
+        parser.error(
+            "--cache does not go with --checkpoint, --from/--to, --follow "
+            "or --by-device"
+        )
+    profile = None
+    if args.profile:
+        profile = Profile()
+        instrument(profile)
+    file = open(args.output, "w", encoding="utf-8", newline="") if args.output else None
+    sink = SINKS[args.format](file)
+    try:
+        run(args, filenames, parser, sink)
+    finally:
+        sink.close()
+        if profile is not None:
+            profile.restore()
+            profile.save(args.profile, profiled_rows(profile), file=filenames[0])
+
+
+def run(args, filenames, parser, sink):
+    if args.follow or args.by_device or args.checkpoint:
+        if any(map(is_compressed, filenames)):
+            parser.error("--follow, --by-device and --checkpoint need a plain text log")
+    if args.follow:
+        if len(filenames) != 1:
+            parser.error("--follow takes exactly one log file")
+        sink.source = filenames[0]
+        sink.banner("Following: %s" % filenames[0])
+        follow(filenames[0], args.checks, sink)
+    elif args.by_device:
+        if len(filenames) != 1:
+            parser.error("--by-device takes exactly one log file")
+        sink.banner("Reading: %s" % filenames[0])
+        run_devices(filenames[0], args.jobs, args.checks, sink)
+    elif len(filenames) == 1 and args.jobs is None:
+        sink.source = filenames[0]
+        sink.banner("Reading: %s" % filenames[0])
+        if args.start is not None or args.stop is not None:
+            analyze_range(
+                filenames[0],
+                float("-inf") if args.start is None else args.start,
+                float("inf") if args.stop is None else args.stop,
+                sink,
+                args.checks,
             )
-
-        if stop_pos is not None:  # should stop, start check
-            if (
-                current["Status"] == "stop"
-                and time_delta(current["Date(UTC+0)"], stop_pos["Date(UTC+0)"])
-                < settings.TRIGGER_TIME
-            ):
-                # running task stopped
-                check_should_stop_list = RunList()
-                stop_pos = None
-            elif (
-                time_delta(current["Date(UTC+0)"], stop_pos["Date(UTC+0)"])
-                >= settings.TRIGGER_TIME
-                or i == len(logdata) - 1
-            ):
-                logger(
-                    "STOP",
-                    "Should "
-                    + setcolor("RED", "STOP")
-                    + " at %s, Speed: %f miles/hr (during last hour)."
-                    % (stop_pos["Log ID"], avg_speed_running),
-                )
-                check_should_stop_list = RunList()
-                stop_pos = None
-
-        # ================= Battery check =================
-
-        # ================= Performance evaluation =================
-
-        if (
-            current["Status"] in settings.idle_state
-            and prev["Status"] not in settings.idle_state
-            and start_idle is None
-        ):
-            start_idle = current
-
-        if current["Status"] in settings.idle_state and start_idle is not None:
-            inactive_time = time_delta(
-                current["Date(UTC+0)"], start_idle["Date(UTC+0)"]
+        elif args.checkpoint:
+            analyze_resumable(filenames[0], args.checkpoint, sink, args.checks)
+        else:
+            analyze(
+                filenames[0],
+                sink,
+                args.cache,
+                args.parse_jobs,
+                args.checks,
+                args.columnar,
             )
-
-        if (
-            current["Status"] == "start_mobileinsight"
-            and prev["Status"] in settings.idle_state
-        ):
-            # end of idle
-            start_idle = None
-
-        if (
-            not perf_eval
-            and current["Status"] == "start_mobileinsight"
-            and prev["Status"] in settings.idle_state
-        ):
-            perf_eval = True
-
-        if perf_eval:
-            perf_list.append(current)
-            # if inactive for too long, stop performance evaluation
-            if inactive_time >= settings.IDLE_TIME or (
-                i == len(logdata) - 1  # end of log
-            ):
-                # get running interval, start evaluate
-                perf_idle, perf_total = perf_evaluate(perf_list)
-                total_idle += perf_idle
-                total_run += perf_total
-                perf_eval = False
-                perf_list = []
-                inactive_time = 0
-                start_idle = None
-
-        # end of performance evaluation
-
-    # performance evaluation
-    total_run = 1 if total_run == 0 else total_run
-    logger("Performance", "%f" % ((total_run - total_idle) / total_run))
+    else:
+        run_batch(filenames, args.jobs, args.chunksize, args.cache, args.checks, sink)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+import gzip
+import hashlib
+import os
+import pickle
+
+from logreader import PathTotals, parse_header, read_batches
+
+VERSION = 7
+
+
+def fingerprint(line):
+    return hashlib.sha1(line).hexdigest()
+
+
+def load(path):
+    # None when there is no usable checkpoint
+    try:
+        with gzip.open(path, "rb") as file:
+            state = pickle.load(file)
+    except (OSError, EOFError, AttributeError, ImportError, pickle.UnpicklingError):
+        return None
+    if not isinstance(state, dict) or state.get("version") != VERSION:
+        return None
+    return state
+
+
+def save(path, tail, line, analyzer, totals):
+    # Rows are added to the top of the log, right below the header. Everything
+    # already processed stays at the end of the file, so remember where the
+    # newest processed line sits counted back from EOF.
+    last = analyzer.prev
+    state = {
+        "version": VERSION,
+        "tail": tail,
+        "line": line,
+        "last": None if last is None else (last.log_id, last.date),
+        "analyzer": analyzer,
+        "totals": totals,
+    }
+    tmp = path + ".tmp"
+    with gzip.open(tmp, "wb") as out:
+        pickle.dump(state, out, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def resume(filename, path, analyzer):
+    # Feed `analyzer` the records that are not covered by the checkpoint at
+    # `path`, then checkpoint again. Returns the analyzer holding the full
+    # state; it is a fresh one unless the checkpoint matches this log.
+    state = load(path)
+    with open(filename, "rb") as file:
+        index = parse_header(file.readline())
+        start = file.tell()
+        end = file.seek(0, os.SEEK_END)
+        # what is fed below, taken before feeding: rows inserted meanwhile
+        # are left for the next run
+        tail = end - start
+        file.seek(start)
+        line = fingerprint(file.readline())
+        totals = PathTotals()
+        if state is not None and end - state["tail"] >= start:
+            boundary = end - state["tail"]
+            file.seek(boundary)
+            same = state["analyzer"].checks == analyzer.checks
+            if same and fingerprint(file.readline()) == state["line"]:
+                # only the rows above the old newest line are new
+                state["analyzer"].report = analyzer.report
+                analyzer = state["analyzer"]
+                totals = state["totals"]
+                end = boundary
+        for batch in read_batches(file, index, start, end, totals):
+            for current in batch:
+                analyzer.feed(current)
+        save(path, tail, line, analyzer, totals)
+    return analyzer
@@ -0,0 +1,147 @@
+import numpy as np
+
+from distance import POINT_MODELS
+from status import *
+from utils import settings
+
+
+def transitions(status):
+    # Per-row state flags and the state changes the checks react to, each
+    # row compared with the one before it (the first row with itself), for
+    # a whole status code column at once
+    flags = FLAG_ARRAY[status]
+    prev_flags = np.concatenate((flags[:1], flags[:-1]))
+    idle = (flags & IDLE) != 0
+    prev_idle = (prev_flags & IDLE) != 0
+    return {
+        "flags": flags,
+        "idle": idle,
+        "prev_idle": prev_idle,
+        "running": (flags & RUNNING) != 0,
+        # idle -> start_mobileinsight
+        "started": (status == START_MOBILEINSIGHT) & prev_idle,
+        # running -> stop
+        "stopped": (status == STOP) & ((prev_flags & RUNNING) != 0),
+    }
+
+
+def member_hops(columns, rows):
+    # miles from each of `rows` to the next one, as utils.hop measures them:
+    # the segment column for neighbouring rows, between the two locations
+    # otherwise
+    hops = columns["segment"][rows[1:]]
+    apart = np.flatnonzero(np.diff(rows) != 1)
+    if len(apart):
+        lat, lng = columns["lat"].tolist(), columns["lng"].tolist()
+        model = POINT_MODELS[settings.DISTANCE_MODEL]
+        hops[apart] = [
+            model(lat[first], lng[first], lat[second], lng[second])
+            for first, second in zip(rows[apart].tolist(), rows[apart + 1].tolist())
+        ]
+    return hops
+
+
+def window_speeds(timestamps, columns, members, ends, span):
+    # Speed (miles/sec) of utils.SlidingWindow(span) fed the `members` rows
+    # and cleared at every row of `ends`, as it stands at each of those rows.
+    # Instead of visiting every member, jump from one window start to the
+    # next with a binary search: timestamps must not decrease.
+    rows = np.flatnonzero(members)
+    times = timestamps[rows]
+    hops = member_hops(columns, rows)
+    speeds = np.empty(len(ends))
+    low = 0
+    for i, end in enumerate(ends.tolist()):
+        high = int(np.searchsorted(rows, end))
+        start = low
+        while True:
+            start_next = int(np.searchsorted(times, times[start] + span))
+            if start_next >= high:
+                break
+            start = start_next
+        first, last = rows[start], rows[high - 1]
+        time = abs(timestamps[last] - timestamps[first])
+        if time == 0:
+            time = 1  # prevent divide by zero
+        # hop by hop, in the order SlidingWindow adds them up
+        speeds[i] = sum(hops[start : high - 1].tolist()) / time
+        low = high
+    return speeds
+
+
+def perf_evaluate(timestamps, idle, start, stop):
+    # (idle time, total running time) of the performance interval of rows
+    # start:stop, as stages.PerfInterval would add them up. Idle time is the
+    # time spent in idle runs that a non-idle row follows, running time the
+    # span up to the last non-idle row.
+    times = timestamps[start:stop]
+    idle = np.asarray(idle[start:stop], dtype=bool)
+    busy = np.flatnonzero(~idle)
+    if len(busy):
+        times = times[: busy[-1] + 1]
+        idle = idle[: busy[-1] + 1]
+    step = np.diff(idle.astype(np.int8))
+    starts = np.flatnonzero(step == 1) + 1
+    ends = np.flatnonzero(step == -1)
+    if idle[0]:
+        # the interval opened idle, that run has no start
+        ends = ends[1:]
+    # same order of additions as the row by row version
+    idle_time = sum(np.abs(times[ends] - times[starts]).tolist())
+    return idle_time, abs(float(times[0]) - float(times[-1]))
+
+
+def next_index(mask):
+    # for every row, the first row at or after it where mask is set, or
+    # len(mask) when there is none
+    rows = np.where(mask, np.arange(len(mask)), len(mask))
+    return np.minimum.accumulate(rows[::-1])[::-1]
+
+
+def upload_misses(timestamps, status, upload_status):
+    # Logs that were not uploaded in time, as arrays of the task_complete row
+    # that started each upload timer and the row the timer ran out at
+    # (len(status) when it ran to the end of the log). Mirrors the streaming
+    # upload stage: a timer runs from a task_complete row until UPLOAD_TIME
+    # has passed or a new task starts, and another task_complete replaces
+    # it. Timestamps must not decrease.
+    n = len(status)
+    tasks = np.flatnonzero(status == TASK_COMPLETE)
+    # n + 1: never replaced, not even at the end of the log
+    replaced = np.append(tasks[1:], n + 1)
+    expired = np.searchsorted(timestamps, timestamps[tasks] + settings.UPLOAD_TIME)
+    started = next_index(status == START_MOBILEINSIGHT)[tasks]
+    ends = np.minimum(expired, started)
+    # rows of a complete upload before the timer ran out
+    uploaded = next_index(upload_status == UPLOAD_COMPLETE)[tasks]
+    missed = (replaced > ends) & (uploaded > np.minimum(ends, expired - 1))
+    return tasks[missed], ends[missed]
+
+
+def hours(timestamps):
+    # UTC hour of day of epoch seconds
+    return (np.asarray(timestamps, dtype=float) // 3600 % 24).astype(np.int8)
+
+
+def night_mask(hours):
+    start, end = settings.NIGHT_START, settings.NIGHT_END
+    if start <= end:
+        return (hours >= start) & (hours < end)
+    # the night wraps around midnight
+    return (hours >= start) | (hours < end)
+
+
+def night_intervals(timestamps, active):
+    # Intervals of active rows at night, as arrays of first row, last row
+    # and row count. Rows more than IDLE_TIME apart belong to different
+    # intervals.
+    timestamps = np.asarray(timestamps, dtype=float)
+    rows = np.flatnonzero(
+        night_mask(hours(timestamps)) & np.asarray(active, dtype=bool)
+    )
+    if len(rows) == 0:
+        return rows, rows, rows
+    gap = np.diff(timestamps[rows]) > settings.IDLE_TIME
+    starts = np.flatnonzero(np.concatenate(([True], gap)))
+    stops = np.append(starts[1:], len(rows))
+    return rows[starts], rows[stops - 1], stops - starts
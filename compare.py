@@ -0,0 +1,263 @@
+import argparse
+import random
+from datetime import timedelta
+
+import numpy as np
+
+from columnar import perf_evaluate, upload_misses, window_speeds
+from distance import POINT_MODELS
+from genlog import SITES
+from logreader import Record
+from stages import PerfInterval, Upload
+from status import *
+from timeparse import EPOCH
+from utils import IdleList, RunList, SlidingWindow, settings
+
+
+def hop_distance(first, second):
+    # the distance model the legacy code below sums, in place of geopy
+    model = POINT_MODELS[settings.DISTANCE_MODEL]
+    return model(*first.location, *second.location)
+
+
+def legacy_is_in_table(table, last_elem):
+    for _, v in table.items():
+        if v["list"][-1].log_id == last_elem.log_id:
+            return True
+    return False
+
+
+def legacy_table_insert(table, item):
+    # table_insert as it was before utils.SlidingWindow, on Records
+    for _, v in table.items():
+        # if out of range, not append
+        if abs(item.timestamp - v["time"]) < settings.IDLE_TIME:
+            v["list"].append(item)
+    if not legacy_is_in_table(table, item):
+        table[item.log_id] = {"time": item.timestamp, "list": [item]}
+    return table
+
+
+def legacy_table_speed(table):
+    # miles/sec of the last interval, as check_shouldnt_start/stop read it
+    for _, v in table.items():
+        time = abs(v["time"] - v["list"][-1].timestamp)
+        time = 1 if time == 0 else time
+        dist = 0
+        for elem in range(1, len(v["list"])):
+            dist += hop_distance(v["list"][elem - 1], v["list"][elem])
+        speed = dist / time
+    return speed
+
+
+def legacy_list_speed(rows):
+    # RunList/IdleList summary() speed before they kept a running total
+    if len(rows) < 2:
+        return -1
+    time = abs(rows[0].timestamp - rows[-1].timestamp)
+    if time == 0:
+        time = 1
+    dist = 0
+    for i in range(1, len(rows)):
+        dist += hop_distance(rows[i - 1], rows[i])
+    return dist / time
+
+
+def legacy_perf_evaluate(perf_list):
+    # perf_evaluate as it was before stages.PerfInterval, on Records
+    def is_idle(row):
+        return FLAGS[row.status] & IDLE != 0
+
+    # get last stop status position
+    for i in range(len(perf_list) - 1, -1, -1):
+        if not is_idle(perf_list[i]):
+            perf_list = perf_list[: i + 1]
+            break
+    # get idle time and total running time
+    start_idle = None
+    idle_time = 0
+    for i in range(1, len(perf_list)):
+        if not is_idle(perf_list[i - 1]) and is_idle(perf_list[i]):
+            start_idle = perf_list[i]
+
+        if (
+            start_idle is not None
+            and not is_idle(perf_list[i])
+            and is_idle(perf_list[i - 1])
+        ):
+            idle_time += abs(perf_list[i - 1].timestamp - start_idle.timestamp)
+            start_idle = None
+
+    total_run_time = abs(perf_list[0].timestamp - perf_list[-1].timestamp)
+    return idle_time, total_run_time
+
+
+def legacy_upload(rows):
+    # log ids the upload check of the old main loop reported, in order
+    missed = []
+    log_upload_timer = None
+    log_uploaded = False
+    for i, current in enumerate(rows):
+        if current.status == TASK_COMPLETE:
+            log_upload_timer = current
+            log_uploaded = False
+
+        if log_upload_timer is not None:
+            passed_time = abs(current.timestamp - log_upload_timer.timestamp)
+            if (
+                current.upload_status == UPLOAD_COMPLETE
+                and passed_time < settings.UPLOAD_TIME
+            ):
+                log_uploaded = True
+
+            if (
+                passed_time >= settings.UPLOAD_TIME
+                or current.status == START_MOBILEINSIGHT
+                or i == len(rows) - 1  # end of log
+            ):
+                if not log_uploaded:
+                    missed.append(log_upload_timer.log_id)
+                log_upload_timer = None
+                log_uploaded = False
+    return missed
+
+
+def random_rows(rng, count, statuses, gaps):
+    # Records with timestamps that never decrease, `gaps` seconds apart,
+    # wandering around a site and standing still now and then
+    lat, lng = rng.choice(SITES)
+    timestamp = float(rng.randrange(1500000000, 1600000000))
+    rows = []
+    for i in range(count):
+        timestamp += rng.choice(gaps)
+        if rng.random() < 0.6:
+            lat += rng.uniform(-0.01, 0.01)
+            lng += rng.uniform(-0.01, 0.01)
+        current = Record(
+            "%08x" % i,
+            rng.randrange(101),
+            (lat, lng),
+            STATUS_CODES[rng.choice(statuses)],
+            UPLOAD_CODES[rng.choice(["idle", "uploading", "complete"])],
+            EPOCH + timedelta(seconds=timestamp),
+            0.0,
+            timestamp,
+        )
+        if rows:
+            current = current._replace(segment=hop_distance(rows[-1], current))
+        rows.append(current)
+    return rows
+
+
+def compare_windows(rng, rounds):
+    # SlidingWindow and columnar.window_speeds against the window tables,
+    # RunList and IdleList against the row lists
+    checks = 0
+    for _ in range(rounds):
+        rows = random_rows(
+            rng, rng.randrange(2, 120), ["idle"], [0, 1, 30, 60, 300, 600, 1000]
+        )
+        members = [rng.random() < 0.7 for _ in rows]
+        # windows are cleared right after a member, at a row that is not one
+        ends = [
+            i > 0 and members[i - 1] and not members[i] and rng.random() < 0.5
+            for i in range(len(rows))
+        ]
+        window = SlidingWindow(settings.IDLE_TIME)
+        table = {}
+        streamed = []
+        for i, current in enumerate(rows):
+            prev = rows[i - 1] if i else current
+            if members[i]:
+                window.insert(current, prev)
+                legacy_table_insert(table, current)
+            if ends[i]:
+                speed = window.speed()
+                assert speed == legacy_table_speed(table), (i, rows)
+                streamed.append(speed)
+                window.clear()
+                table = {}
+                checks += 1
+
+        columns = {
+            "segment": np.array([current.segment for current in rows]),
+            "lat": np.array([current.location[0] for current in rows]),
+            "lng": np.array([current.location[1] for current in rows]),
+        }
+        speeds = window_speeds(
+            np.array([current.timestamp for current in rows]),
+            columns,
+            np.array(members),
+            np.flatnonzero(ends),
+            settings.IDLE_TIME,
+        )
+        assert speeds.tolist() == streamed, rows
+
+        for kind in (RunList, IdleList):
+            listed = kind()
+            kept = []
+            for i, current in enumerate(rows):
+                if members[i]:
+                    listed.add(current, rows[i - 1] if i else current)
+                    kept.append(current)
+                    _, speed = listed.summary()
+                    assert speed == legacy_list_speed(kept), (i, rows)
+                    checks += 1
+    print("windows and lists: %d rounds, %d speeds identical" % (rounds, checks))
+
+
+def compare_perf(rng, rounds):
+    # stages.PerfInterval and columnar.perf_evaluate against perf_evaluate
+    statuses = settings.idle_state + settings.running_state + ["stop"]
+    for _ in range(rounds):
+        rows = random_rows(rng, rng.randrange(1, 60), statuses, [0, 1, 60, 300, 900])
+        expected = legacy_perf_evaluate(rows)
+        interval = PerfInterval()
+        for current in rows:
+            interval.add(current.timestamp, FLAGS[current.status] & IDLE != 0)
+        assert interval.result() == expected, rows
+        timestamps = np.array([current.timestamp for current in rows])
+        idle = FLAG_ARRAY[[current.status for current in rows]] & IDLE != 0
+        assert perf_evaluate(timestamps, idle, 0, len(rows)) == expected, rows
+    print("perf_evaluate: %d intervals identical" % rounds)
+
+
+def compare_upload(rng, rounds):
+    # the upload stage and columnar.upload_misses against the old main loop
+    statuses = ["idle", "task_complete", "start_mobileinsight", "running", "stop"]
+    for _ in range(rounds):
+        rows = random_rows(rng, rng.randrange(1, 80), statuses, [0, 1, 120, 600, 1500])
+        found = []
+        stage = Upload(lambda finding: found.append((row, finding.log_id)))
+        for row, current in enumerate(rows):
+            stage.feed(current, None)
+        row = len(rows)
+        stage.finish()
+        assert [log_id for _, log_id in found] == legacy_upload(rows), rows
+        tasks, ends = upload_misses(
+            np.array([current.timestamp for current in rows]),
+            np.array([current.status for current in rows], dtype=np.uint8),
+            np.array([current.upload_status for current in rows], dtype=np.uint8),
+        )
+        scanned = [(end, rows[task].log_id) for task, end in zip(tasks, ends)]
+        assert scanned == found, rows
+    print("upload: %d logs identical" % rounds)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the checks against the code they replaced on "
+        "random rows."
+    )
+    parser.add_argument("--rounds", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    compare_windows(rng, args.rounds)
+    compare_perf(rng, args.rounds)
+    compare_upload(rng, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import bz2
+import gzip
+import lzma
+import queue
+import threading
+
+from utils import settings
+
+# leading bytes of every compressed format read, and how to open it
+MAGIC = [
+    (b"\x1f\x8b", gzip.open),
+    (b"BZh", bz2.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+]
+
+
+def opener(filename):
+    # the open() that decompresses a compressed log, None for plain text
+    with open(filename, "rb") as file:
+        head = file.read(6)
+    for magic, open_ in MAGIC:
+        if head.startswith(magic):
+            return open_
+    return None
+
+
+def is_compressed(filename):
+    return opener(filename) is not None
+
+
+def put(blocks, item, stop):
+    # wait for room in the queue unless the reader is gone
+    while not stop.is_set():
+        try:
+            blocks.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def decompress(filename, open_, blocks, stop):
+    # thread: decompressed blocks into `blocks`, then None, or the error
+    try:
+        with open_(filename, "rb") as file:
+            for block in iter(lambda: file.read(settings.READ_BUFFER), b""):
+                if not put(blocks, block, stop):
+                    return
+        put(blocks, None, stop)
+    except Exception as e:
+        put(blocks, e, stop)
+
+
+def decompressed_lines(filename):
+    # Raw lines of a compressed log, in file order. A background thread
+    # decompresses at most DECOMPRESS_QUEUE blocks ahead of the caller:
+    # both run at the same time (zlib, bz2 and lzma let go of the GIL) and
+    # memory does not depend on the size of the log.
+    blocks = queue.Queue(settings.DECOMPRESS_QUEUE)
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=decompress,
+        args=(filename, opener(filename), blocks, stop),
+        daemon=True,
+    )
+    thread.start()
+    tail = b""
+    try:
+        while True:
+            block = blocks.get()
+            if block is None:
+                break
+            if isinstance(block, Exception):
+                raise block
+            lines = (tail + block).split(b"\n")
+            # last piece may be a partial line, keep it for the next block
+            tail = lines.pop()
+            yield from lines
+        yield tail
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,140 @@
+import multiprocessing
+import zlib
+from queue import Empty, Full
+
+from logreader import PathTotals, parse_header, parse_line, reversed_lines
+from stages import Analyzer
+from utils import settings
+
+
+def device_worker(tasks, results, index, checks):
+    # owns the analyzers of every device routed to it: fed batches of raw
+    # lines of one device, oldest first, until a None arrives. A device
+    # whose lines fail is dropped and its error sent back in place of its
+    # totals, the others carry on.
+    devices = {}
+    errors = {}
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        device, lines = task
+        if device in errors:
+            continue
+        if device not in devices:
+            findings = []
+            devices[device] = (
+                Analyzer(findings.append, checks),
+                PathTotals(),
+                findings,
+            )
+        analyzer, totals, _ = devices[device]
+        try:
+            batch = [
+                fields
+                for fields in map(parse_line, [index] * len(lines), lines)
+                if fields
+            ]
+            if batch:
+                for current in totals.add(batch):
+                    analyzer.feed(current)
+        except Exception as e:
+            errors[device] = "%s: %s" % (type(e).__name__, e)
+    for device, (analyzer, _, findings) in devices.items():
+        if device not in errors:
+            try:
+                analyzer.finish()
+            except Exception as e:
+                errors[device] = "%s: %s" % (type(e).__name__, e)
+        if device in errors:
+            results.put((device, findings, 0, 0, errors[device]))
+        else:
+            results.put(
+                (device, findings, analyzer.total_idle, analyzer.total_run, None)
+            )
+    results.put(None)
+
+
+def send(queue, worker, task):
+    # wait for room, unless the worker died and will never make any
+    while True:
+        try:
+            queue.put(task, timeout=1)
+            return
+        except Full:
+            if not worker.is_alive():
+                raise RuntimeError("device worker exited with %s" % worker.exitcode)
+
+
+def route(device, jobs):
+    # stable across processes, unlike hash() of a str
+    return zlib.crc32(device.encode("utf-8")) % jobs
+
+
+def analyze_devices(filename, jobs=None, checks=None, batch_size=None):
+    # Split an interleaved multi-phone log by its Phone column in one
+    # backwards pass and analyze every phone on its own. Each phone always
+    # goes to the same worker process, which parses its lines and keeps its
+    # state. Returns {phone: (findings, total_idle, total_run, error)}.
+    jobs = jobs or multiprocessing.cpu_count()
+    batch_size = batch_size or settings.BATCH_SIZE
+    with open(filename, "rb") as file:
+        header = file.readline()
+        index = parse_header(header)
+        phone = header.decode("utf-8").rstrip().split("\t").index("Phone")
+        start = file.tell()
+
+        # bounded queues: reading waits when the workers fall behind
+        queues = [multiprocessing.Queue(maxsize=4) for _ in range(jobs)]
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=device_worker, args=(queue, results, index, checks)
+            )
+            for queue in queues
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            pending = {}
+            for line in reversed_lines(file, start):
+                fields = line.split(b"\t", phone + 1)
+                if len(fields) <= phone:
+                    continue
+                device = fields[phone].decode("utf-8")
+                lines = pending.setdefault(device, [])
+                lines.append(line)
+                if len(lines) >= batch_size:
+                    worker = route(device, jobs)
+                    send(queues[worker], workers[worker], (device, lines))
+                    pending[device] = []
+            for device, lines in pending.items():
+                if lines:
+                    worker = route(device, jobs)
+                    send(queues[worker], workers[worker], (device, lines))
+            for queue, worker in zip(queues, workers):
+                send(queue, worker, None)
+
+            devices = {}
+            done = 0
+            while done < jobs:
+                try:
+                    result = results.get(timeout=1)
+                except Empty:
+                    dead = [w.exitcode for w in workers if w.exitcode not in (None, 0)]
+                    if dead:
+                        raise RuntimeError("device worker exited with %s" % dead[0])
+                    continue
+                if result is None:
+                    done += 1
+                    continue
+                device, findings, idle, run, error = result
+                devices[device] = findings, idle, run, error
+        except BaseException:
+            for worker in workers:
+                worker.terminate()
+            raise
+        finally:
+            for worker in workers:
+                worker.join()
+    return devices
@@ -0,0 +1,198 @@
+import math
+
+import numpy as np
+
+# All distances are returned in miles, like geopy's `.miles`
+KM_PER_MILE = 1.609344
+
+# geopy.distance.EARTH_RADIUS, mean radius used by great_circle
+EARTH_RADIUS = 6371.009 / KM_PER_MILE
+
+# WGS-84 ellipsoid, the default of geopy.distance.geodesic
+WGS84_A = 6378.137 / KM_PER_MILE
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+# Vincenty's inverse formula converges to well under a millimetre of
+# geopy's geodesic; nearly antipodal pairs that do not converge within
+# MAX_ITERATIONS are handed over to geopy.
+MAX_ITERATIONS = 200
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(np.radians, (lat1, lng1, lat2, lng2))
+    h = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+
+def vincenty_terms(lam, sin_u1, cos_u1, sin_u2, cos_u2):
+    # the terms of Vincenty's inverse formula for longitude difference `lam`
+    sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+    sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+    cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+    sigma = np.arctan2(sin_sigma, cos_sigma)
+    # coincident points have no azimuth, their distance stays 0
+    same = sin_sigma == 0
+    safe_sin_sigma = np.where(same, 1, sin_sigma)
+    sin_alpha = cos_u1 * cos_u2 * sin_lam / safe_sin_sigma
+    cos2_alpha = 1 - sin_alpha**2
+    # equatorial lines have cos2_alpha == 0
+    equatorial = cos2_alpha == 0
+    cos_2sigma_m = np.where(
+        equatorial,
+        0,
+        cos_sigma - 2 * sin_u1 * sin_u2 / np.where(equatorial, 1, cos2_alpha),
+    )
+    return sin_sigma, cos_sigma, sigma, same, sin_alpha, cos2_alpha, cos_2sigma_m
+
+
+def point_terms(lam, sin_u1, cos_u1, sin_u2, cos_u2):
+    # vincenty_terms() of a single pair
+    sin_lam, cos_lam = math.sin(lam), math.cos(lam)
+    sin_sigma = math.hypot(
+        cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam
+    )
+    cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+    sigma = math.atan2(sin_sigma, cos_sigma)
+    same = sin_sigma == 0
+    sin_alpha = cos_u1 * cos_u2 * sin_lam / (1 if same else sin_sigma)
+    cos2_alpha = 1 - sin_alpha**2
+    if cos2_alpha == 0:
+        cos_2sigma_m = 0
+    else:
+        cos_2sigma_m = cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha
+    return sin_sigma, cos_sigma, sigma, same, sin_alpha, cos2_alpha, cos_2sigma_m
+
+
+def next_lambda(L, terms):
+    # one iteration of Vincenty's formula, for arrays or single pairs
+    sin_sigma, cos_sigma, sigma, _, sin_alpha, cos2_alpha, cos_2sigma_m = terms
+    C = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+    return L + (1 - C) * WGS84_F * sin_alpha * (
+        sigma
+        + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1 + 2 * cos_2sigma_m**2))
+    )
+
+
+def geodesic_length(terms):
+    # miles along the ellipsoid once lambda converged, for arrays or single
+    # pairs; coincident points are left to the caller
+    sin_sigma, cos_sigma, sigma, _, _, cos2_alpha, cos_2sigma_m = terms
+    u_sq = cos2_alpha * (WGS84_A**2 - WGS84_B**2) / WGS84_B**2
+    A = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    B = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = (
+        B
+        * sin_sigma
+        * (
+            cos_2sigma_m
+            + B
+            / 4
+            * (
+                cos_sigma * (-1 + 2 * cos_2sigma_m**2)
+                - B
+                / 6
+                * cos_2sigma_m
+                * (-3 + 4 * sin_sigma**2)
+                * (-3 + 4 * cos_2sigma_m**2)
+            )
+        )
+    )
+    return WGS84_B * A * (sigma - delta_sigma)
+
+
+def ellipsoidal(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (lat1, lng1, lat2, lng2))
+    )
+    shape = lat1.shape
+    lat1, lng1, lat2, lng2 = (x.ravel() for x in (lat1, lng1, lat2, lng2))
+    if lat1.size == 0:
+        return np.zeros(shape)
+
+    # reduced latitudes
+    u1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    reduced = np.sin(u1), np.cos(u1), np.sin(u2), np.cos(u2)
+    L = np.radians(lng2 - lng1)
+
+    lam = L.copy()
+    active = np.ones(lat1.shape, dtype=bool)
+    for _ in range(MAX_ITERATIONS):
+        terms = vincenty_terms(lam, *reduced)
+        lam_next = next_lambda(L, terms)
+        converged = (np.abs(lam_next - lam) < 1e-12) | terms[3]
+        lam = np.where(active, lam_next, lam)
+        active &= ~converged
+        if not active.any():
+            break
+    # the terms of every pair from its own last lam, so that a pair's result
+    # does not depend on the rest of the array
+    terms = vincenty_terms(lam, *reduced)
+    dist = np.where(terms[3], 0, geodesic_length(terms))
+
+    if active.any():
+        # did not converge (nearly antipodal points), ask geopy
+        import geopy.distance
+
+        for i in np.flatnonzero(active):
+            dist[i] = geopy.distance.geodesic(
+                (lat1[i], lng1[i]), (lat2[i], lng2[i])
+            ).miles
+    return dist.reshape(shape)
+
+
+def point_ellipsoidal(lat1, lng1, lat2, lng2):
+    # ellipsoidal() of a single pair, without the cost of arrays
+    u1 = math.atan((1 - WGS84_F) * math.tan(math.radians(lat1)))
+    u2 = math.atan((1 - WGS84_F) * math.tan(math.radians(lat2)))
+    reduced = math.sin(u1), math.cos(u1), math.sin(u2), math.cos(u2)
+    L = math.radians(lng2 - lng1)
+
+    lam = L
+    for _ in range(MAX_ITERATIONS):
+        terms = point_terms(lam, *reduced)
+        lam_next = next_lambda(L, terms)
+        converged = abs(lam_next - lam) < 1e-12 or terms[3]
+        lam = lam_next
+        if converged:
+            break
+    else:
+        import geopy.distance
+
+        return geopy.distance.geodesic((lat1, lng1), (lat2, lng2)).miles
+    terms = point_terms(lam, *reduced)
+    return 0.0 if terms[3] else geodesic_length(terms)
+
+
+def point_haversine(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    h = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(max(h, 0), 1)))
+
+
+MODELS = {
+    "haversine": haversine,
+    "ellipsoidal": ellipsoidal,
+}
+
+# the same models for one pair of points at a time
+POINT_MODELS = {
+    "haversine": point_haversine,
+    "ellipsoidal": point_ellipsoidal,
+}
+
+
+def segment_distances(lats, lngs, model="ellipsoidal"):
+    # distance between every pair of consecutive points, in one call
+    lats = np.asarray(lats, dtype=float)
+    lngs = np.asarray(lngs, dtype=float)
+    if len(lats) < 2:
+        return np.zeros(0)
+    return MODELS[model](lats[:-1], lngs[:-1], lats[1:], lngs[1:])
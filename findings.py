@@ -0,0 +1,141 @@
+import csv
+import json
+import sys
+import time
+from collections import namedtuple
+
+from utils import log_line, logger, setcolor, settings
+
+# one problem found in a log. `log_id`/`timestamp` locate the row it was
+# found at, `first_id`/`first_timestamp` where an interval began; `speed` is
+# in miles/hr and `threshold` is the setting it was compared against.
+FIELDS = [
+    "kind",
+    "log_id",
+    "timestamp",
+    "speed",
+    "threshold",
+    "first_id",
+    "first_timestamp",
+    "value",
+    "detail",
+]
+Finding = namedtuple("Finding", FIELDS, defaults=[None] * (len(FIELDS) - 1))
+
+
+def clock(timestamp):
+    date = time.gmtime(timestamp)
+    return "%d:%02d" % (date.tm_hour, date.tm_min)
+
+
+def render(finding):
+    # the (classes, message) checklog has always printed for a finding
+    kind = finding.kind
+    if kind in ("shouldnt_start", "shouldnt_stop", "should_start", "should_stop"):
+        verdict = {
+            "shouldnt_start": "NOT START",
+            "shouldnt_stop": "NOT STOP",
+            "should_start": "START",
+            "should_stop": "STOP",
+        }[kind]
+        speed = finding.speed
+        if kind in ("should_start", "should_stop"):
+            # these lines have always shown miles/sec, labelled miles/hr
+            speed /= 3600
+        return (
+            "STOP" if kind.endswith("stop") else "START",
+            "Should "
+            + setcolor("RED", verdict)
+            + " at %s, Speed: %f miles/hr (during last hour)."
+            % (finding.log_id, speed),
+        )
+    if kind == "upload":
+        return "UPLOAD", "Log was " + setcolor("RED", "NOT ") + "uploaded: %s" % (
+            finding.log_id
+        )
+    if kind == "battery":
+        return "BATTERY", "%s~%s Decreased: %d%%" % (
+            finding.first_id,
+            finding.log_id,
+            finding.value,
+        )
+    if kind == "night":
+        return "TIME", "%s~%s, %s~%s, %d rows" % (
+            finding.first_id,
+            finding.log_id,
+            clock(finding.first_timestamp),
+            clock(finding.timestamp),
+            finding.value,
+        )
+    if kind == "performance":
+        return "Performance", "%f" % finding.value
+    return kind.upper(), finding.detail or ""
+
+
+class Sink:
+    # buffered writer of findings; `source` names the log they came from
+    def __init__(self, file=None):
+        self.file = file or sys.stdout
+        self.source = None
+        self.buffer = []
+
+    def __call__(self, finding):
+        self.buffer.append(self.format(finding))
+        if len(self.buffer) >= settings.FINDINGS_BUFFER:
+            self.flush()
+
+    def banner(self, title):
+        pass
+
+    def flush(self):
+        if self.buffer:
+            self.file.writelines(self.buffer)
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        if self.file is not sys.stdout:
+            self.file.close()
+
+
+class ConsoleSink(Sink):
+    # the colored text format, with a title above each log
+    def banner(self, title):
+        self.buffer.append(title + "\n================================\n")
+
+    def format(self, finding):
+        classes, message = render(finding)
+        return log_line(classes, message) + "\n"
+
+
+class JsonLinesSink(Sink):
+    def format(self, finding):
+        record = dict(zip(FIELDS, finding), source=self.source)
+        return json.dumps(record, ensure_ascii=False) + "\n"
+
+
+class CsvSink(Sink):
+    def __init__(self, file=None):
+        super().__init__(file)
+        self.writer = csv.writer(self)
+        self.writer.writerow(FIELDS + ["source"])
+
+    def write(self, line):
+        # csv.writer output goes through the buffer
+        self.buffer.append(line)
+
+    def __call__(self, finding):
+        self.writer.writerow(
+            ["" if value is None else value for value in finding] + [self.source or ""]
+        )
+        if len(self.buffer) >= settings.FINDINGS_BUFFER:
+            self.flush()
+
+
+SINKS = {"console": ConsoleSink, "jsonl": JsonLinesSink, "csv": CsvSink}
+
+
+def console(finding):
+    # unbuffered console output, the default report callback
+    logger(*render(finding))
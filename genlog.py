@@ -0,0 +1,175 @@
+import argparse
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from logreader import HEADER
+
+# AP style month names, as Django prints them
+MONTHS = [
+    "Jan.",
+    "Feb.",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+    "Aug.",
+    "Sept.",
+    "Oct.",
+    "Nov.",
+    "Dec.",
+]
+
+# base coordinates the generated devices wander around
+SITES = [(24.7866494, 121.002015), (22.9970821, 120.221225), (25.0339640, 121.564468)]
+
+
+def django_date(date):
+    # "Nov. 1, 2019, 8:47 a.m.", "2 p.m.", "noon", "midnight"
+    if date.minute == 0 and date.hour in (0, 12):
+        clock = "midnight" if date.hour == 0 else "noon"
+    else:
+        hour = date.hour % 12 or 12
+        clock = "%d:%02d" % (hour, date.minute) if date.minute else "%d" % hour
+        clock += " a.m." if date.hour < 12 else " p.m."
+    return "%s %d, %d, %s" % (MONTHS[date.month - 1], date.day, date.year, clock)
+
+
+class Device:
+    # random walk through the states a real phone goes through
+    def __init__(self, rng, phone, start):
+        self.rng = rng
+        self.phone = phone
+        self.date = start
+        self.battery = rng.randint(40, 100)
+        self.lat, self.lng = rng.choice(SITES)
+        self.upload = "idle"
+        self.uploads = []
+
+    def row(self, status, moving=False, upload=None, description="None"):
+        rng = self.rng
+        self.date += timedelta(seconds=rng.choice([0, 0, 20, 40, 60, 60, 120, 300]))
+        if moving:
+            # about 10-40 miles/hr between rows
+            self.lat += rng.gauss(0, 0.004)
+            self.lng += rng.gauss(0, 0.004)
+        elif rng.random() < 0.2:
+            # GPS jitter while standing still
+            self.lat += rng.gauss(0, 0.00005)
+            self.lng += rng.gauss(0, 0.00005)
+        if status == "running" and rng.random() < 0.1:
+            self.battery = max(1, self.battery - 1)
+        elif status == "idle" and rng.random() < 0.2:
+            # charging between tasks
+            self.battery = min(100, self.battery + rng.randint(1, 3))
+        if upload is not None:
+            self.upload = upload
+        if rng.random() < 0.002:
+            location = rng.choice(["(0, 0)", "(-1, -1)"])
+        else:
+            location = "(%.8f,%.6f)" % (self.lat, self.lng)
+        return "\t".join(
+            [
+                "%08x" % rng.getrandbits(32),
+                self.phone,
+                rng.choice(["中華電信", "Chunghwa Telecom"]),
+                "466/92",
+                rng.choice(["WIFI", "WIFI", "LTE", ""]),
+                "%d%%" % self.battery,
+                location,
+                status,
+                description,
+                self.upload,
+                "MobileInsight likely dead" if status == "offline" else "None",
+                django_date(self.date),
+            ]
+        )
+
+    def session(self):
+        # rows of one idle -> task -> upload cycle, oldest first
+        rng = self.rng
+        moving = rng.random() < 0.6
+        # upload of the previous task finishes during the next idle rows
+        uploads = self.uploads
+        # short breaks keep a performance interval open, long ones end it
+        idle = rng.randint(1, 4) if rng.random() < 0.5 else rng.randint(5, 40)
+        for _ in range(max(idle, len(uploads))):
+            upload = uploads.pop(0) if uploads else rng.choice(["idle", "check"])
+            yield self.row("idle", moving=moving and rng.random() < 0.3, upload=upload)
+        if rng.random() < 0.1:
+            for _ in range(rng.randint(1, 10)):
+                yield self.row("offline", upload="idle")
+        if rng.random() < 0.2:
+            yield self.row("downloading")
+            yield self.row("download_complete")
+        for _ in range(rng.randint(1, 3)):
+            yield self.row("start_mobileinsight", moving=moving)
+        for _ in range(rng.randint(1, 2)):
+            yield self.row("start_task", description="MMLabv2", upload="idle")
+        for _ in range(rng.randint(1, 120)):
+            yield self.row("running", moving=moving and rng.random() < 0.9)
+        end = rng.random()
+        if end < 0.15:
+            yield self.row("mobileinsight_likely_dead")
+            self.uploads = ["no_logs"]
+            return
+        if end < 0.25:
+            yield self.row("offline")
+            self.uploads = []
+            return
+        yield self.row("stop", moving=moving)
+        for _ in range(rng.randint(1, 3)):
+            yield self.row("task_complete", description="MMLabv2")
+        outcome = rng.choice(["complete", "complete", "no_logs", "canceled", None])
+        self.uploads = ["check"] + ["uploading"] * rng.randint(0, 20)
+        if outcome is not None:
+            self.uploads.append(outcome)
+
+
+def generate(filename, rows, seed=0, phones=1, chunk=100000):
+    # write a newest-first log of `rows` rows. Rows are generated oldest
+    # first, so each chunk goes to its own temporary file, reversed, and the
+    # chunks are joined in reverse order: memory stays at one chunk.
+    rng = random.Random(seed)
+    start = datetime(2019, 10, 1)
+    devices = [Device(rng, "E%04d" % (6653 + i), start) for i in range(phones)]
+    sessions = [device.session() for device in devices]
+    parts = []
+    written = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        while written < rows:
+            lines = []
+            while len(lines) < min(chunk, rows - written):
+                # interleave devices by always advancing the one furthest behind
+                i = min(range(phones), key=lambda i: devices[i].date)
+                line = next(sessions[i], None)
+                if line is None:
+                    sessions[i] = devices[i].session()
+                    continue
+                lines.append(line)
+            parts.append(os.path.join(tmp, "%d" % len(parts)))
+            with open(parts[-1], "w", encoding="utf-8") as file:
+                file.write("\n".join(reversed(lines)) + "\n")
+            written += len(lines)
+        with open(filename, "w", encoding="utf-8") as out:
+            out.write("\t".join(HEADER) + "\n")
+            for part in reversed(parts):
+                with open(part, "r", encoding="utf-8") as file:
+                    for block in iter(lambda: file.read(1 << 20), ""):
+                        out.write(block)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic device log.")
+    parser.add_argument("filename")
+    parser.add_argument("-n", "--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--phones", type=int, default=1)
+    args = parser.parse_args()
+    generate(args.filename, args.rows, args.seed, args.phones)
+
+
+if __name__ == "__main__":
+    main()
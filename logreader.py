@@ -0,0 +1,265 @@
+import os
+import pickle
+import tempfile
+import time
+from ast import literal_eval
+from collections import namedtuple
+
+import numpy as np
+
+from compressed import decompressed_lines, is_compressed
+from distance import segment_distances
+from status import STATUS_CODES, UPLOAD_CODES
+from timeparse import EPOCH, parse_timestamp
+from utils import settings
+
+# every column of a raw log, in file order
+HEADER = [
+    "Log ID",
+    "Phone",
+    "Operator",
+    "mcc/mnc",
+    "Network Status",
+    "Battery",
+    "Location(Lat,Lng)",
+    "Status",
+    "Description",
+    "Upload Status",
+    "Task Error",
+    "Date(UTC+0)",
+]
+
+# columns kept from the raw log, in output order
+COLUMNS = [
+    "Log ID",
+    "Battery",
+    "Location(Lat,Lng)",
+    "Status",
+    "Upload Status",
+    "Date(UTC+0)",
+]
+
+# columns computed at ingest: miles from the previous record (0 for the
+# first one) and seconds since EPOCH
+DERIVED = ["Segment", "Timestamp"]
+
+# one parsed row, fields in COLUMNS + DERIVED order
+Record = namedtuple(
+    "Record",
+    [
+        "log_id",
+        "battery",
+        "location",
+        "status",
+        "upload_status",
+        "date",
+        "segment",
+        "timestamp",
+    ],
+)
+
+# kept under its old name for callers of checklog.timeformat
+timeformat = parse_timestamp
+
+
+def reversed_lines(file, start, end=None, bufsize=None):
+    # yield raw lines between byte offsets `start` and `end` (default EOF),
+    # last line first
+    bufsize = bufsize or settings.READ_BUFFER
+    pos = file.seek(0, os.SEEK_END) if end is None else end
+    tail = b""
+    while pos > start:
+        size = min(bufsize, pos - start)
+        pos -= size
+        file.seek(pos)
+        lines = (file.read(size) + tail).split(b"\n")
+        # first piece may be a partial line, keep it for the next block
+        tail = lines[0]
+        for line in reversed(lines[1:]):
+            yield line
+    yield tail
+
+
+def parse_header(line):
+    header = line.decode("utf-8").rstrip().split("\t")
+    return [header.index(name) for name in COLUMNS]
+
+
+def parse_line(index, line):
+    # returns the COLUMNS fields, None for blank lines and default coordinates.
+    # Status and Upload Status come back as their status.py codes.
+    line = line.decode("utf-8").rstrip()
+    if not line:
+        return None
+    fields = line.split("\t")
+    location = literal_eval(fields[index[2]])
+    # Remove default location
+    if location in settings.IGNORE_COORD:
+        return None
+    return (
+        fields[index[0]],
+        # Remove percent sign for Battery
+        int(fields[index[1]].replace("%", "")),
+        location,
+        STATUS_CODES.get(fields[index[3]], 0),
+        UPLOAD_CODES.get(fields[index[4]], 0),
+        parse_timestamp(fields[index[5]]),
+    )
+
+
+class PathTotals:
+    # fills the derived columns, carrying the last location across batches
+    def __init__(self, model=None):
+        self.model = model or settings.DISTANCE_MODEL
+        self.last = None
+
+    def add(self, batch):
+        # turns a batch of parsed fields into Records
+        locations = [fields[2] for fields in batch]
+        if self.last is not None:
+            locations.insert(0, self.last)
+        lats, lngs = zip(*locations)
+        steps = segment_distances(lats, lngs, self.model).tolist()
+        if self.last is None:
+            steps.insert(0, 0.0)
+        self.last = locations[-1]
+        return [
+            Record(*fields, step, (fields[5] - EPOCH).total_seconds())
+            for fields, step in zip(batch, steps)
+        ]
+
+
+def read_batches(file, index, start, end=None, totals=None, batch_size=None):
+    # records of the lines between byte offsets `start` and `end`; log files
+    # are newest first, so read them backwards to get chronological order
+    # without loading the whole range
+    batch_size = batch_size or settings.BATCH_SIZE
+    totals = totals or PathTotals()
+    batch = []
+    for line in reversed_lines(file, start, end):
+        fields = parse_line(index, line)
+        if fields is None:
+            continue
+        batch.append(fields)
+        if len(batch) >= batch_size:
+            yield totals.add(batch)
+            batch = []
+    if batch:
+        yield totals.add(batch)
+
+
+def read_compressed_batches(filename, batch_size=None):
+    # Records of a compressed log, oldest first. It can only be read from the
+    # front, newest row first: parse it while it is being decompressed, spill
+    # every batch reversed to a temporary file and replay them last to first.
+    batch_size = batch_size or settings.BATCH_SIZE
+    with tempfile.TemporaryFile() as spill:
+        offsets = []
+        index = None
+        batch = []
+        for line in decompressed_lines(filename):
+            if index is None:
+                index = parse_header(line)
+                continue
+            fields = parse_line(index, line)
+            if fields is None:
+                continue
+            batch.append(fields)
+            if len(batch) >= batch_size:
+                offsets.append(spill.tell())
+                pickle.dump(batch[::-1], spill, pickle.HIGHEST_PROTOCOL)
+                batch = []
+        if batch:
+            offsets.append(spill.tell())
+            pickle.dump(batch[::-1], spill, pickle.HIGHEST_PROTOCOL)
+        totals = PathTotals()
+        for offset in reversed(offsets):
+            spill.seek(offset)
+            yield totals.add(pickle.load(spill))
+
+
+def iterlog_batches(filename, batch_size=None):
+    if is_compressed(filename):
+        yield from read_compressed_batches(filename, batch_size)
+        return
+    with open(filename, "rb") as file:
+        index = parse_header(file.readline())
+        yield from read_batches(file, index, file.tell(), batch_size=batch_size)
+
+
+def iterlog(filename, batch_size=None):
+    for batch in iterlog_batches(filename, batch_size):
+        yield from batch
+
+
+def to_columns(records):
+    # Records -> dict of numpy arrays, one per column
+    log_id, battery, location, status, upload_status, date, segment, _ = zip(*records)
+    lat, lng = zip(*location)
+    return {
+        "log_id": np.array(log_id, dtype=str),
+        "battery": np.array(battery, dtype=np.int16),
+        "lat": np.array(lat, dtype=float),
+        "lng": np.array(lng, dtype=float),
+        "status": np.array(status, dtype=np.uint8),
+        "upload_status": np.array(upload_status, dtype=np.uint8),
+        "date": np.array(date, dtype="datetime64[s]"),
+        "segment": np.array(segment, dtype=float),
+    }
+
+
+def from_columns(columns, start=0, stop=None):
+    # rows start:stop of to_columns() output back to Records
+    part = {name: column[start:stop] for name, column in columns.items()}
+    return list(
+        map(
+            Record,
+            part["log_id"].tolist(),
+            part["battery"].tolist(),
+            zip(part["lat"].tolist(), part["lng"].tolist()),
+            part["status"].tolist(),
+            part["upload_status"].tolist(),
+            part["date"].tolist(),
+            part["segment"].tolist(),
+            part["date"].astype(np.int64).astype(float).tolist(),
+        )
+    )
+
+
+def column_batches(columns, batch_size=None):
+    # Records of to_columns() output, batch_size rows at a time
+    batch_size = batch_size or settings.BATCH_SIZE
+    if columns is None:
+        return
+    for start in range(0, len(columns["date"]), batch_size):
+        yield from_columns(columns, start, start + batch_size)
+
+
+def follow_batches(filename, interval=None):
+    # Records of a live log, oldest first, as rows are added. New rows go
+    # right below the header, so like checkpoint.resume() remember where the
+    # newest row read sits counted back from EOF and on every poll read only
+    # the rows above it.
+    interval = interval or settings.FOLLOW_INTERVAL
+    totals = PathTotals()
+    tail = newest = None
+    while True:
+        with open(filename, "rb") as file:
+            header = file.readline()
+            header_end = file.tell()
+            size = file.seek(0, os.SEEK_END)
+            boundary = size if tail is None else size - tail
+            grown = header.endswith(b"\n") and boundary > header_end
+            if grown and tail is not None:
+                # a log caught while being rewritten waits for the next poll
+                file.seek(boundary)
+                grown = file.readline() == newest
+            if grown:
+                # the newest row of this poll, read along with `size` before
+                # the rows are handed out and the log has time to change
+                file.seek(header_end)
+                newest = file.readline()
+                tail = size - header_end
+                index = parse_header(header)
+                yield from read_batches(file, index, header_end, boundary, totals)
+        time.sleep(interval)
@@ -0,0 +1,75 @@
+import mmap
+import multiprocessing
+
+import numpy as np
+
+from compressed import is_compressed
+from distance import segment_distances
+from logreader import iterlog, parse_header, parse_line, to_columns
+from utils import settings
+
+
+def split_ranges(mm, start, end, size):
+    # newline aligned byte ranges of about `size` bytes covering start:end
+    ranges = []
+    while start < end:
+        stop = mm.find(b"\n", min(start + size, end) - 1, end)
+        stop = end if stop == -1 else stop + 1
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def parse_range(task):
+    # pool worker: parse one byte range of the log, in file order
+    filename, index, start, end = task
+    with open(filename, "rb") as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            lines = mm[start:end].split(b"\n")
+    rows = [fields for fields in (parse_line(index, line) for line in lines) if fields]
+    if not rows:
+        return None
+    log_id, battery, location, status, upload_status, date = zip(*rows)
+    lat, lng = zip(*location)
+    return {
+        "log_id": np.array(log_id, dtype=str),
+        "battery": np.array(battery, dtype=np.int16),
+        "lat": np.array(lat, dtype=float),
+        "lng": np.array(lng, dtype=float),
+        "status": np.array(status, dtype=np.uint8),
+        "upload_status": np.array(upload_status, dtype=np.uint8),
+        "date": np.array(date, dtype="datetime64[s]"),
+    }
+
+
+def parse_parallel(filename, jobs=None, chunk_size=None):
+    # readlog's columns (see logreader.to_columns), parsed by `jobs` processes
+    if is_compressed(filename):
+        # no byte ranges to split a compressed log into, parse it as a stream
+        records = list(iterlog(filename))
+        return to_columns(records) if records else None
+    chunk_size = chunk_size or settings.PARSE_CHUNK
+    with open(filename, "rb") as file:
+        index = parse_header(file.readline())
+        start = file.tell()
+        end = file.seek(0, 2)
+        if end <= start:
+            ranges = []
+        else:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                ranges = split_ranges(mm, start, end, chunk_size)
+
+    tasks = [(filename, index, start, stop) for start, stop in ranges]
+    with multiprocessing.Pool(jobs) as pool:
+        parts = [part for part in pool.map(parse_range, tasks) if part is not None]
+    if not parts:
+        return None
+
+    # the file is newest first: reverse every range and their order
+    columns = {
+        name: np.concatenate([part[name][::-1] for part in reversed(parts)])
+        for name in parts[0]
+    }
+    steps = segment_distances(columns["lat"], columns["lng"], settings.DISTANCE_MODEL)
+    columns["segment"] = np.concatenate(([0.0], steps))
+    return columns
@@ -0,0 +1,83 @@
+import json
+import time
+
+
+class Profile:
+    # Wall time and call counts of patched functions. Nothing is wrapped
+    # until patch() is called, so runs without a profile pay nothing.
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages = {}
+        self.calls = {}
+        self.sizes = {}
+        self.patched = []
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def size(self, name, value):
+        # count, total and max of a table size
+        count, total, largest = self.sizes.get(name, (0, 0, 0))
+        self.sizes[name] = (count + 1, total + value, max(largest, value))
+
+    def patch(self, owner, attr, name, size=None, generator=False):
+        # replace owner.attr by a timed wrapper; `size(*args)` is recorded
+        # for every call, generators are timed on every step
+        func = getattr(owner, attr)
+        profile = self
+        # list functions that were never called too
+        self.stages.setdefault(name, 0.0)
+        self.calls.setdefault(name, 0)
+
+        if generator:
+
+            def wrapper(*args, **kwargs):
+                steps = func(*args, **kwargs)
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(steps)
+                    except StopIteration:
+                        profile.add(name, time.perf_counter() - start)
+                        return
+                    profile.add(name, time.perf_counter() - start)
+                    yield item
+
+        else:
+
+            def wrapper(*args, **kwargs):
+                if size is not None:
+                    profile.size(name, size(*args, **kwargs))
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profile.add(name, time.perf_counter() - start)
+
+        setattr(owner, attr, wrapper)
+        self.patched.append((owner, attr, func))
+
+    def restore(self):
+        for owner, attr, func in reversed(self.patched):
+            setattr(owner, attr, func)
+        self.patched = []
+
+    def summary(self, rows):
+        wall = time.perf_counter() - self.start
+        return {
+            "wall": wall,
+            "rows": rows,
+            "rows_per_sec": rows / wall if wall else 0.0,
+            "stages": self.stages,
+            "calls": self.calls,
+            "sizes": {
+                name: {"count": count, "mean": total / count, "max": largest}
+                for name, (count, total, largest) in self.sizes.items()
+            },
+        }
+
+    def save(self, path, rows, **extra):
+        with open(path, "w") as file:
+            json.dump(dict(extra, **self.summary(rows)), file, indent=2)
+            file.write("\n")
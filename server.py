@@ -0,0 +1,180 @@
+import argparse
+import asyncio
+import functools
+import signal
+
+from checklog import parse_checks
+from findings import SINKS, Finding
+from logreader import HEADER, PathTotals, parse_header, parse_line
+from stages import STAGES, Analyzer
+from utils import settings
+
+
+def well_formed(fields):
+    # parse_line accepts any literal as a location, a row needs (lat, lng)
+    location = fields[2]
+    return (
+        isinstance(location, tuple)
+        and len(location) == 2
+        and all(
+            isinstance(x, (int, float)) and not isinstance(x, bool) for x in location
+        )
+    )
+
+
+def column_index(header):
+    # parse_line's column indexes and the Phone column of a header line
+    names = header.decode("utf-8").rstrip().split("\t")
+    return parse_header(header), names.index("Phone")
+
+
+class Ingest:
+    # Log lines pushed by any number of connections, analyzed per phone.
+    # Readers parse their lines and queue them; one consumer feeds every
+    # phone's analyzer. A full queue stops the readers from reading, which
+    # pushes back on the senders through TCP flow control.
+    def __init__(self, sink, checks=None):
+        self.sink = sink
+        self.checks = checks
+        self.devices = {}
+        self.queue = asyncio.Queue(settings.SERVER_QUEUE)
+        self.readers = set()
+        # the phone the findings printed last belong to
+        self.shown = None
+
+    async def handle(self, reader, writer):
+        self.readers.add(asyncio.current_task())
+        index, phone = column_index("\t".join(HEADER).encode("utf-8"))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.startswith(b"Log ID\t"):
+                    # a header sets the column order of this connection
+                    index, phone = column_index(line)
+                    continue
+                try:
+                    fields = parse_line(index, line)
+                    device = line.split(b"\t")[phone].decode("utf-8")
+                except Exception:
+                    # malformed line, drop it: literal_eval alone can raise
+                    # ValueError, SyntaxError, TypeError or RecursionError
+                    continue
+                if fields is not None and well_formed(fields):
+                    await self.queue.put((device, fields))
+        except (ConnectionError, ValueError):
+            # reset connection or a line longer than SERVER_LINE
+            pass
+        finally:
+            self.readers.discard(asyncio.current_task())
+            writer.close()
+
+    async def run(self):
+        while True:
+            rows = [await self.queue.get()]
+            while not self.queue.empty() and len(rows) < settings.BATCH_SIZE:
+                rows.append(self.queue.get_nowait())
+            self.feed(rows)
+            if self.queue.empty():
+                self.sink.flush()
+
+    def feed(self, rows):
+        # one distance batch per phone, each phone's rows kept in order
+        batches = {}
+        for device, fields in rows:
+            batches.setdefault(device, []).append(fields)
+        for device, batch in batches.items():
+            if device not in self.devices:
+                report = functools.partial(self.report, device)
+                self.devices[device] = Analyzer(report, self.checks), PathTotals()
+            analyzer, totals = self.devices[device]
+            try:
+                for current in totals.add(batch):
+                    analyzer.feed(current)
+            except Exception as e:
+                # one phone's bad rows must not stop the consumer
+                self.report(
+                    device, Finding("error", detail="%s: %s" % (type(e).__name__, e))
+                )
+
+    def report(self, device, finding):
+        # findings of many phones interleave, title them whenever the phone
+        # changes (formats other than console carry it as their source)
+        self.sink.source = device
+        if device != self.shown:
+            self.sink.banner("Device: %s" % device)
+            self.shown = device
+        self.sink(finding)
+
+    def finish(self):
+        rows = []
+        while not self.queue.empty():
+            rows.append(self.queue.get_nowait())
+        self.feed(rows)
+        for device, (analyzer, _) in self.devices.items():
+            try:
+                analyzer.finish()
+            except Exception as e:
+                self.report(
+                    device, Finding("error", detail="%s: %s" % (type(e).__name__, e))
+                )
+        self.sink.flush()
+
+
+async def serve(ingest, host=None, port=None, path=None):
+    if path:
+        server = await asyncio.start_unix_server(
+            ingest.handle, path, limit=settings.SERVER_LINE, backlog=1024
+        )
+    else:
+        server = await asyncio.start_server(
+            ingest.handle, host, port, limit=settings.SERVER_LINE, backlog=1024
+        )
+    # stop on SIGINT/SIGTERM: close every connection, then analyze whatever
+    # was queued and finish every phone
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    consumer = asyncio.ensure_future(ingest.run())
+    try:
+        async with server:
+            await stop.wait()
+            server.close()
+            for task in list(ingest.readers):
+                task.cancel()
+            await asyncio.gather(*ingest.readers, return_exceptions=True)
+    finally:
+        consumer.cancel()
+        ingest.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Analyze log lines pushed over TCP or a Unix socket."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=settings.SERVER_PORT)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket")
+    parser.add_argument(
+        "--checks",
+        type=parse_checks,
+        default=None,
+        metavar="NAME[,NAME...]",
+        help="run only these checks: %s" % ", ".join(STAGES),
+    )
+    parser.add_argument("--format", choices=list(SINKS), default="console")
+    parser.add_argument("-o", "--output", metavar="PATH")
+    args = parser.parse_args()
+
+    file = open(args.output, "w", encoding="utf-8", newline="") if args.output else None
+    sink = SINKS[args.format](file)
+    try:
+        asyncio.run(serve(Ingest(sink, args.checks), args.host, args.port, args.unix))
+    finally:
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,696 @@
+from collections import deque
+
+import numpy as np
+
+from columnar import *
+from findings import Finding, console
+from logreader import column_batches
+from status import *
+from utils import *
+
+
+def check_shouldnt_start(window):
+    # only the newest window decides, older ones have already expired
+    speed = window.speed()
+    # should not start running if moving slower than MOVE_SPEED
+    shouldnt_start_running = speed < settings.MOVE_SPEED
+    return shouldnt_start_running, speed * 3600
+
+
+def check_shouldnt_stop(window):
+    speed = window.speed()
+    should_stop_running = speed < settings.MOVE_SPEED
+    return should_stop_running, speed * 3600
+
+
+def check_should_stop(current, check_should_stop_list, prev=None):
+    # add into running list
+    check_should_stop_list.add(current, prev)
+    stop_pos, avg_speed = check_should_stop_list.summary()
+    return stop_pos, avg_speed
+
+
+def check_should_start(current, check_should_start_list, prev=None):
+    check_should_start_list.add(current, prev)
+    start_pos, avg_speed = check_should_start_list.summary()
+    return start_pos, avg_speed
+
+
+class PerfInterval:
+    # idle and total running time of a performance interval, updated row by
+    # row so the rows need not be kept: time spent in idle runs that have
+    # ended, and the span up to the last non-idle row
+    __slots__ = ("first", "prev", "prev_idle", "last_busy", "idle_start", "idle_time")
+
+    def __init__(self):
+        self.first = None
+        self.prev = None
+        self.prev_idle = False
+        self.last_busy = None
+        self.idle_start = None
+        self.idle_time = 0
+
+    def add(self, timestamp, idle):
+        if self.first is None:
+            self.first = timestamp
+        elif idle and not self.prev_idle:
+            self.idle_start = timestamp
+        elif self.idle_start is not None and not idle and self.prev_idle:
+            self.idle_time += abs(self.prev - self.idle_start)
+            self.idle_start = None
+        if not idle:
+            self.last_busy = timestamp
+        self.prev = timestamp
+        self.prev_idle = idle
+
+    def result(self):
+        # trailing idle rows do not count as running time
+        last = self.prev if self.last_busy is None else self.last_busy
+        return self.idle_time, abs(self.first - last)
+
+
+def performance(total_idle, total_run):
+    total_run = 1 if total_run == 0 else total_run
+    return (total_run - total_idle) / total_run
+
+
+class Step:
+    # facts about the current row that several stages test, worked out once
+    # per row by the dispatcher
+    __slots__ = ("prev", "flags", "is_idle", "prev_idle", "started", "stopped")
+
+    def __init__(self):
+        self.prev = None
+        self.flags = 0
+        self.is_idle = False
+        self.prev_idle = False
+        self.started = False
+        self.stopped = False
+
+    def update(self, prev, current):
+        self.prev = prev
+        self.flags = flags = FLAGS[current.status]
+        prev_flags = FLAGS[prev.status]
+        self.is_idle = flags & IDLE
+        self.prev_idle = prev_flags & IDLE
+        # idle -> start_mobileinsight and running -> stop transitions
+        self.started = current.status == START_MOBILEINSIGHT and self.prev_idle
+        self.stopped = current.status == STOP and prev_flags & RUNNING
+
+
+class Stage:
+    # one check: fed every record in time order, then finished at end of log
+    def __init__(self, report=console):
+        self.report = report
+
+    def __getstate__(self):
+        # the report callback belongs to the running process, not the state
+        state = self.__dict__.copy()
+        del state["report"]
+        return state
+
+    def bind(self, marks):
+        # called with the whole-log arrays before Analyzer.run_columns
+        pass
+
+    def feed(self, current, step):
+        pass
+
+    def finish(self):
+        pass
+
+
+# ================= Check should not Start =================
+class ShouldNotStart(Stage):
+    def __init__(self, report=console):
+        super().__init__(report)
+        self.idle_window = SlidingWindow(settings.IDLE_TIME)
+        self.shouldnt_start_running = False
+
+    def feed(self, current, step):
+        if step.is_idle:
+            self.idle_window.insert(current, step.prev)
+
+        # status changed from idle to active, clear window and summary
+        if step.started:
+            self.shouldnt_start_running, speed = check_shouldnt_start(self.idle_window)
+            self.idle_window.clear()
+
+            # if start running, check if indeed should start
+            if self.shouldnt_start_running:
+                self.report(
+                    Finding(
+                        "shouldnt_start",
+                        current.log_id,
+                        current.timestamp,
+                        speed,
+                        settings.MOVE_SPEED * 3600,
+                    )
+                )
+
+    def scan(self, columns, marks):
+        # (row, finding) of the whole log, visiting only idle -> start rows
+        ends = np.flatnonzero(marks["started"])
+        speeds = window_speeds(
+            marks["timestamp"],
+            columns,
+            marks["idle"],
+            ends,
+            settings.IDLE_TIME,
+        )
+        return [
+            (
+                row,
+                Finding(
+                    "shouldnt_start",
+                    str(columns["log_id"][row]),
+                    float(marks["timestamp"][row]),
+                    speed * 3600,
+                    settings.MOVE_SPEED * 3600,
+                ),
+            )
+            for row, speed in zip(ends.tolist(), speeds.tolist())
+            if speed < settings.MOVE_SPEED
+        ]
+
+
+# ================= Check should not stop =================
+class ShouldNotStop(Stage):
+    def __init__(self, report=console):
+        super().__init__(report)
+        self.running_window = SlidingWindow(settings.IDLE_TIME)
+        self.should_stop_running = False
+
+    def feed(self, current, step):
+        if step.flags & RUNNING:
+            self.running_window.insert(current, step.prev)
+
+        # status changed from running to stopped
+        if step.stopped:
+            self.should_stop_running, speed = check_shouldnt_stop(self.running_window)
+            self.running_window.clear()
+
+            if not self.should_stop_running:
+                self.report(
+                    Finding(
+                        "shouldnt_stop",
+                        current.log_id,
+                        current.timestamp,
+                        speed,
+                        settings.MOVE_SPEED * 3600,
+                    )
+                )
+
+    def scan(self, columns, marks):
+        # (row, finding) of the whole log, visiting only running -> stop rows
+        ends = np.flatnonzero(marks["stopped"])
+        speeds = window_speeds(
+            marks["timestamp"],
+            columns,
+            marks["running"],
+            ends,
+            settings.IDLE_TIME,
+        )
+        return [
+            (
+                row,
+                Finding(
+                    "shouldnt_stop",
+                    str(columns["log_id"][row]),
+                    float(marks["timestamp"][row]),
+                    speed * 3600,
+                    settings.MOVE_SPEED * 3600,
+                ),
+            )
+            for row, speed in zip(ends.tolist(), speeds.tolist())
+            if not speed < settings.MOVE_SPEED
+        ]
+
+
+# ================= Check Upload after task_complete =================
+class Upload(Stage):
+    def __init__(self, report=console):
+        super().__init__(report)
+        self.log_upload_timer = None
+        self.log_uploaded = False
+
+    def feed(self, current, step):
+        if current.status == TASK_COMPLETE:
+            # log should upload within "settings.UPLOAD_TIME" minutes
+            self.log_upload_timer = current
+            self.log_uploaded = False
+
+        if self.log_upload_timer is not None:
+            passed_time = abs(current.timestamp - self.log_upload_timer.timestamp)
+            if (
+                current.upload_status == UPLOAD_COMPLETE
+                and passed_time < settings.UPLOAD_TIME
+            ):
+                self.log_uploaded = True
+
+            if (
+                passed_time >= settings.UPLOAD_TIME
+                or current.status == START_MOBILEINSIGHT  # a new task has started
+            ):
+                self.evaluate()
+
+    def evaluate(self):
+        if not self.log_uploaded:
+            self.report(
+                Finding(
+                    "upload",
+                    self.log_upload_timer.log_id,
+                    self.log_upload_timer.timestamp,
+                    threshold=settings.UPLOAD_TIME,
+                )
+            )
+        # clear timer
+        self.log_upload_timer = None
+        self.log_uploaded = False
+
+    def finish(self):
+        if self.log_upload_timer is not None:
+            self.evaluate()
+
+    def scan(self, columns, marks):
+        # (row, finding) of the whole log, a binary search per task_complete
+        tasks, ends = upload_misses(
+            marks["timestamp"], columns["status"], columns["upload_status"]
+        )
+        return [
+            (
+                end,
+                Finding(
+                    "upload",
+                    str(columns["log_id"][task]),
+                    float(marks["timestamp"][task]),
+                    threshold=settings.UPLOAD_TIME,
+                ),
+            )
+            for task, end in zip(tasks.tolist(), ends.tolist())
+        ]
+
+
+# ================= Battery check =================
+class Battery(Stage):
+    # Battery drops of BATTERY_LEVEL or more within BATTERY_TIME. The deque
+    # keeps the rows of the last BATTERY_TIME seconds that no newer row has
+    # matched or beaten, so its front is the highest level in the window and
+    # every row is pushed and popped at most once.
+    def __init__(self, report=console):
+        super().__init__(report)
+        self.window = deque()
+        self.drain_start = None
+        self.drain_end = None
+
+    def feed(self, current, step):
+        if current.status == OFFLINE:
+            # the phone may have been charged while offline, start over
+            self.evaluate()
+            return
+
+        if self.drain_end is not None and (
+            current.battery > self.drain_end.battery
+            or current.timestamp - self.drain_start.timestamp > settings.BATTERY_TIME
+        ):
+            # charging again or out of the window, the drain is over
+            self.evaluate()
+
+        window = self.window
+        while (
+            window and current.timestamp - window[0].timestamp > settings.BATTERY_TIME
+        ):
+            window.popleft()
+        while window and window[-1].battery <= current.battery:
+            window.pop()
+        window.append(current)
+
+        if self.drain_end is not None:
+            if current.battery < self.drain_end.battery:
+                self.drain_end = current
+        elif window[0].battery - current.battery >= settings.BATTERY_LEVEL:
+            self.drain_start = window[0]
+            self.drain_end = current
+
+    def evaluate(self):
+        if self.drain_end is not None:
+            self.report(
+                Finding(
+                    "battery",
+                    self.drain_end.log_id,
+                    self.drain_end.timestamp,
+                    threshold=settings.BATTERY_LEVEL,
+                    first_id=self.drain_start.log_id,
+                    first_timestamp=self.drain_start.timestamp,
+                    value=self.drain_start.battery - self.drain_end.battery,
+                )
+            )
+            self.drain_start = None
+            self.drain_end = None
+        # rows before the end of a reported drain must not open another one
+        self.window.clear()
+
+    def finish(self):
+        self.evaluate()
+
+
+# ================= Should start =================
+class ShouldStart(Stage):
+    def __init__(self, report=console):
+        super().__init__(report)
+        self.start_pos = None
+        self.avg_speed_idle = -1
+        self.check_should_start_list = IdleList()
+
+    def feed(self, current, step):
+        if step.is_idle and self.start_pos is None:
+            self.start_pos, self.avg_speed_idle = check_should_start(
+                current, self.check_should_start_list, step.prev
+            )
+
+        if self.start_pos is not None:
+            elapsed = abs(current.timestamp - self.start_pos.timestamp)
+            if (
+                current.status == START_MOBILEINSIGHT
+                and elapsed < settings.TRIGGER_TIME
+            ):
+                self.check_should_start_list = IdleList()
+                self.start_pos = None
+            elif elapsed >= settings.TRIGGER_TIME:
+                self.report(
+                    Finding(
+                        "should_start",
+                        self.start_pos.log_id,
+                        self.start_pos.timestamp,
+                        self.avg_speed_idle * 3600,
+                        settings.MOVE_SPEED * 3600,
+                    )
+                )
+                self.check_should_start_list = IdleList()
+                self.start_pos = None
+
+
+# ================= Should stop =================
+class ShouldStop(Stage):
+    def __init__(self, report=console):
+        super().__init__(report)
+        self.stop_pos = None
+        self.avg_speed_running = -1
+        self.check_should_stop_list = RunList()
+
+    def feed(self, current, step):
+        if current.status == RUNNING_STATUS and self.stop_pos is None:
+            self.stop_pos, self.avg_speed_running = check_should_stop(
+                current, self.check_should_stop_list, step.prev
+            )
+
+        if self.stop_pos is not None:  # should stop, start check
+            elapsed = abs(current.timestamp - self.stop_pos.timestamp)
+            if current.status == STOP and elapsed < settings.TRIGGER_TIME:
+                # running task stopped
+                self.check_should_stop_list = RunList()
+                self.stop_pos = None
+            elif elapsed >= settings.TRIGGER_TIME:
+                self.evaluate()
+
+    def evaluate(self):
+        self.report(
+            Finding(
+                "should_stop",
+                self.stop_pos.log_id,
+                self.stop_pos.timestamp,
+                self.avg_speed_running * 3600,
+                settings.MOVE_SPEED * 3600,
+            )
+        )
+        self.check_should_stop_list = RunList()
+        self.stop_pos = None
+
+    def finish(self):
+        if self.stop_pos is not None:
+            self.evaluate()
+
+
+# ================= Night time activity =================
+class Night(Stage):
+    # running rows between NIGHT_START and NIGHT_END, reported once per
+    # interval of rows at most IDLE_TIME apart as soon as the next one begins
+    def __init__(self, report=console):
+        super().__init__(report)
+        self.first = None
+        self.last = None
+        self.count = 0
+
+    def feed(self, current, step):
+        if not step.flags & RUNNING:
+            return
+        if not night_mask(int(current.timestamp // 3600 % 24)):
+            return
+        if (
+            self.last is not None
+            and current.timestamp - self.last.timestamp > settings.IDLE_TIME
+        ):
+            self.evaluate()
+        if self.first is None:
+            self.first = current
+        self.last = current
+        self.count += 1
+
+    def evaluate(self):
+        if self.first is not None:
+            self.report_interval(self.first, self.last, self.count)
+            self.first = self.last = None
+            self.count = 0
+
+    def report_interval(self, first, last, count):
+        self.report(
+            Finding(
+                "night",
+                last.log_id,
+                last.timestamp,
+                threshold=settings.IDLE_TIME,
+                first_id=first.log_id,
+                first_timestamp=first.timestamp,
+                value=count,
+            )
+        )
+
+    def finish(self):
+        self.evaluate()
+
+    def scan(self, columns, marks):
+        # (row, finding) of the whole log in one pass over the timestamps; an
+        # interval is reported at the row the next one begins, as feed() does
+        firsts, lasts, counts = night_intervals(marks["timestamp"], marks["running"])
+        reported = np.append(firsts[1:], len(marks["timestamp"]))
+        log_id = columns["log_id"]
+        timestamps = marks["timestamp"]
+        return [
+            (
+                row,
+                Finding(
+                    "night",
+                    str(log_id[last]),
+                    float(timestamps[last]),
+                    threshold=settings.IDLE_TIME,
+                    first_id=str(log_id[first]),
+                    first_timestamp=float(timestamps[first]),
+                    value=count,
+                ),
+            )
+            for row, first, last, count in zip(
+                reported.tolist(), firsts.tolist(), lasts.tolist(), counts.tolist()
+            )
+        ]
+
+
+# ================= Performance evaluation =================
+class Perf(Stage):
+    def __init__(self, report=console):
+        super().__init__(report)
+        self.perf_eval = False
+        self.interval = None
+        self.inactive_time = 0
+        self.start_idle = None
+        self.total_idle = 0
+        self.total_run = 0
+        # whole-log arrays under Analyzer.run_columns, the interval is then
+        # the row it started at
+        self.marks = None
+        self.row = 0
+
+    def bind(self, marks):
+        self.marks = marks
+
+    def feed(self, current, step):
+        self.row += 1
+        if step.is_idle and not step.prev_idle and self.start_idle is None:
+            self.start_idle = current
+
+        if step.is_idle and self.start_idle is not None:
+            self.inactive_time = abs(current.timestamp - self.start_idle.timestamp)
+
+        if step.started:
+            # end of idle
+            self.start_idle = None
+            if not self.perf_eval:
+                self.perf_eval = True
+                self.interval = PerfInterval() if self.marks is None else self.row - 1
+
+        if self.perf_eval:
+            if self.marks is None:
+                self.interval.add(current.timestamp, step.is_idle)
+            # if inactive for too long, stop performance evaluation
+            if self.inactive_time >= settings.IDLE_TIME:
+                self.end()
+
+    def rebase(self):
+        # an open interval starts over at the next row fed, the rows before
+        # it do not count
+        if self.perf_eval:
+            self.interval = PerfInterval() if self.marks is None else self.row
+
+    def end(self):
+        # get running interval, start evaluate
+        if self.marks is None:
+            perf_idle, perf_total = self.interval.result()
+        else:
+            perf_idle, perf_total = perf_evaluate(
+                self.marks["timestamp"], self.marks["idle"], self.interval, self.row
+            )
+        self.total_idle += perf_idle
+        self.total_run += perf_total
+        self.perf_eval = False
+        self.interval = None
+        self.inactive_time = 0
+        self.start_idle = None
+
+    def finish(self):
+        if self.perf_eval:
+            self.end()
+        self.report(
+            Finding("performance", value=performance(self.total_idle, self.total_run))
+        )
+
+
+# every check in the order it sees each row, by its --checks name
+STAGES = {
+    "shouldnt_start": ShouldNotStart,
+    "shouldnt_stop": ShouldNotStop,
+    "upload": Upload,
+    "battery": Battery,
+    "should_start": ShouldStart,
+    "should_stop": ShouldStop,
+    "night": Night,
+    "perf": Perf,
+}
+
+
+class Analyzer:
+    # feeds each record, in time order, to every enabled check stage
+    def __init__(self, report=console, checks=None):
+        self.checks = list(STAGES) if checks is None else list(checks)
+        self.stages = [STAGES[name](report) for name in self.checks]
+        self.step = Step()
+        self.prev = None
+        self.report = report
+
+    @property
+    def report(self):
+        return self._report
+
+    @report.setter
+    def report(self, report):
+        self._report = report
+        for stage in self.stages:
+            stage.report = report
+
+    def __getstate__(self):
+        # the report callback belongs to the running process, not the state
+        state = self.__dict__.copy()
+        del state["_report"]
+        return state
+
+    def stage(self, name):
+        return self.stages[self.checks.index(name)] if name in self.checks else None
+
+    @property
+    def total_idle(self):
+        perf = self.stage("perf")
+        return 0 if perf is None else perf.total_idle
+
+    @property
+    def total_run(self):
+        perf = self.stage("perf")
+        return 0 if perf is None else perf.total_run
+
+    def feed(self, current):
+        step = self.step
+        step.update(current if self.prev is None else self.prev, current)
+        for stage in self.stages:
+            stage.feed(current, step)
+        self.prev = current
+
+    def finish(self):
+        # end of log: close whatever is still pending
+        for stage in self.stages:
+            stage.finish()
+
+    def run_columns(self, columns):
+        # Analyze a whole log given as logreader.to_columns() arrays, finish
+        # included. The state changes of every row are worked out up front;
+        # stages with a scan() only look at the rows where their state
+        # changes, the others are fed row by row. Findings are reported in
+        # the order feed() and finish() would have reported them.
+        found = []
+        row = 0
+
+        def collect(position):
+            return lambda finding: found.append((row, position, finding))
+
+        timestamps = columns["date"].astype(np.int64).astype(float)
+        marks = transitions(columns["status"])
+        marks["timestamp"] = timestamps
+        # windows are only searchable when time never goes backwards
+        ordered = not np.any(np.diff(timestamps) < 0)
+        streaming = []
+        for position, stage in enumerate(self.stages):
+            if ordered and hasattr(stage, "scan"):
+                found += [
+                    (at, position, finding)
+                    for at, finding in stage.scan(columns, marks)
+                ]
+            else:
+                stage.report = collect(position)
+                stage.bind(marks)
+                streaming.append(stage)
+
+        if streaming:
+            step = self.step
+            flags = marks["flags"].tolist()
+            idle = marks["idle"].tolist()
+            prev_idle = marks["prev_idle"].tolist()
+            started = marks["started"].tolist()
+            stopped = marks["stopped"].tolist()
+            for batch in column_batches(columns):
+                for current in batch:
+                    step.prev = current if self.prev is None else self.prev
+                    step.flags = flags[row]
+                    step.is_idle = idle[row]
+                    step.prev_idle = prev_idle[row]
+                    step.started = started[row]
+                    step.stopped = stopped[row]
+                    for stage in streaming:
+                        stage.feed(current, step)
+                    row += 1
+                    self.prev = current
+        row = len(timestamps)
+        for stage in streaming:
+            stage.finish()
+
+        # sort is stable: a stage's own findings keep their order
+        found.sort(key=lambda item: item[:2])
+        # give the stages their own report callback back
+        self.report = self.report
+        for _, _, finding in found:
+            self.report(finding)
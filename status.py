@@ -0,0 +1,56 @@
+import numpy as np
+
+from utils import settings
+
+# Status and Upload Status values by their code, code 0 stands for any
+# value not listed. Codes are fixed so that every process agrees on them.
+STATUSES = [
+    "unknown",
+    "idle",
+    "offline",
+    "download_complete",
+    "downloading",
+    "task_complete",
+    "mobileinsight_likely_dead",
+    "start_task",
+    "running",
+    "start_mobileinsight",
+    "stop",
+]
+STATUSES += [
+    name
+    for name in settings.idle_state + settings.running_state + settings.stop_state
+    if name not in STATUSES
+]
+UPLOAD_STATUSES = [
+    "unknown",
+    "idle",
+    "check",
+    "uploading",
+    "complete",
+    "no_logs",
+    "canceled",
+]
+
+STATUS_CODES = {name: code for code, name in enumerate(STATUSES)}
+UPLOAD_CODES = {name: code for code, name in enumerate(UPLOAD_STATUSES)}
+
+# membership of settings.idle_state, running_state and stop_state as bits
+IDLE = 1
+RUNNING = 2
+STOPPED = 4
+
+FLAGS = [
+    (IDLE if name in settings.idle_state else 0)
+    | (RUNNING if name in settings.running_state else 0)
+    | (STOPPED if name in settings.stop_state else 0)
+    for name in STATUSES
+]
+FLAG_ARRAY = np.array(FLAGS, dtype=np.uint8)
+
+OFFLINE = STATUS_CODES["offline"]
+TASK_COMPLETE = STATUS_CODES["task_complete"]
+RUNNING_STATUS = STATUS_CODES["running"]
+START_MOBILEINSIGHT = STATUS_CODES["start_mobileinsight"]
+STOP = STATUS_CODES["stop"]
+UPLOAD_COMPLETE = UPLOAD_CODES["complete"]
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+
+from checkpoint import fingerprint
+from compressed import is_compressed
+from logreader import iterlog, parse_header, read_batches
+from timeparse import EPOCH, ONE_SECOND, parse_timestamp
+from utils import settings
+
+VERSION = 1
+HOUR = 3600
+
+
+def index_path(filename, cache_dir=None):
+    cache_dir = cache_dir or settings.CACHE_DIR
+    name = hashlib.sha1(os.path.abspath(filename).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, "index", name + ".json")
+
+
+def load(path):
+    try:
+        with open(path) as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return state if state.get("version") == VERSION else None
+
+
+def save(path, state):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as file:
+        json.dump(state, file)
+    os.replace(tmp, path)
+
+
+def scan(file, start, end, column):
+    # [hour, byte offset] wherever the hour of the lines between start and
+    # end changes, in file order, and whether the hours only ever fell
+    buckets = []
+    ordered = True
+    file.seek(start)
+    pos = start
+    while pos < end:
+        line = file.readline()
+        if not line:
+            break
+        fields = line.rstrip(b"\r\n").split(b"\t")
+        try:
+            date = parse_timestamp(fields[column].decode("utf-8"))
+        except (IndexError, ValueError):
+            pos += len(line)
+            continue
+        seconds = (date - EPOCH) // ONE_SECOND
+        hour = seconds - seconds % HOUR
+        if not buckets or buckets[-1][0] != hour:
+            if buckets and hour > buckets[-1][0]:
+                ordered = False
+            buckets.append([hour, pos])
+        pos += len(line)
+    return buckets, ordered
+
+
+def update(filename, path=None):
+    # The hour index of a log, built or brought up to date. Rows are added
+    # right below the header, so offsets are kept counted back from EOF:
+    # they stay valid as the log grows and only the new rows get scanned.
+    path = path or index_path(filename)
+    state = load(path)
+    with open(filename, "rb") as file:
+        header = file.readline()
+        header_end = file.tell()
+        size = file.seek(0, os.SEEK_END)
+        column = header.decode("utf-8").rstrip().split("\t").index("Date(UTC+0)")
+        end = size
+        hours = []
+        ordered = True
+        if state is not None and size - state["tail"] >= header_end:
+            boundary = size - state["tail"]
+            file.seek(boundary)
+            if fingerprint(file.readline()) == state["line"]:
+                if boundary == header_end:
+                    return state
+                end = boundary
+                hours = state["hours"]
+                ordered = state["ordered"]
+        new, new_ordered = scan(file, header_end, end, column)
+        if new and hours:
+            if new[-1][0] == hours[0][0]:
+                # that hour now starts among the new rows
+                hours = hours[1:]
+            elif new[-1][0] < hours[0][0]:
+                ordered = False
+        hours = [[hour, size - pos] for hour, pos in new] + hours
+        file.seek(header_end)
+        state = {
+            "version": VERSION,
+            "tail": size - header_end,
+            "line": fingerprint(file.readline()),
+            "ordered": ordered and new_ordered,
+            "hours": hours,
+        }
+    save(path, state)
+    return state
+
+
+def byte_range(state, size, start, stop):
+    # byte offsets holding every row from `start` up to `stop` seconds
+    begin = end = size
+    for hour, from_eof in state["hours"]:
+        if begin == size and hour < stop:
+            begin = size - from_eof
+        if hour + HOUR <= start:
+            end = size - from_eof
+            break
+    return begin, max(begin, end)
+
+
+def iter_range(filename, start, stop, path=None):
+    # records from `start` up to `stop` seconds, oldest first, reading only
+    # the part of the log the hour index points at
+    if is_compressed(filename):
+        # nothing to seek in, look at every row
+        for current in iterlog(filename):
+            if start <= current.timestamp < stop:
+                yield current
+        return
+    state = update(filename, path)
+    with open(filename, "rb") as file:
+        index = parse_header(file.readline())
+        header_end = file.tell()
+        size = file.seek(0, os.SEEK_END)
+        if state["ordered"]:
+            begin, end = byte_range(state, size, start, stop)
+        else:
+            # time goes back and forth, every row has to be looked at
+            begin, end = header_end, size
+        for batch in read_batches(file, index, begin, end):
+            for current in batch:
+                if start <= current.timestamp < stop:
+                    yield current
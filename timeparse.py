@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+from utils import settings
+
+# Django's "N" date format uses AP style month names ("Sept.", "March")
+MONTHS = {
+    "jan": 1,
+    "feb": 2,
+    "mar": 3,
+    "apr": 4,
+    "may": 5,
+    "jun": 6,
+    "jul": 7,
+    "aug": 8,
+    "sep": 9,
+    "oct": 10,
+    "nov": 11,
+    "dec": 12,
+}
+
+MERIDIEM = {"a.m.": 0, "am": 0, "p.m.": 12, "pm": 12}
+
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+
+
+def parse_clock(clock):
+    # "8:47 a.m.", "2 p.m.", "noon" or "midnight" -> (hour, minute)
+    if clock == "noon":
+        return 12, 0
+    if clock == "midnight":
+        return 0, 0
+    time, meridiem = clock.split(" ")
+    hour, _, minute = time.partition(":")
+    hour, minute = int(hour), int(minute or 0)
+    if not 1 <= hour <= 12 or not 0 <= minute <= 59:
+        raise ValueError("invalid time: %r" % clock)
+    return hour % 12 + MERIDIEM[meridiem.lower()], minute
+
+
+@lru_cache(maxsize=settings.TIMESTAMP_CACHE)
+def parse_timestamp(raw):
+    # "Nov. 1, 2019, 8:47 a.m." -> datetime(2019, 11, 1, 8, 47)
+    try:
+        date, year, clock = raw.split(", ")
+        month, day = date.split(" ")
+        hour, minute = parse_clock(clock)
+        return datetime(
+            int(year), MONTHS[month.rstrip(".")[:3].lower()], int(day), hour, minute
+        )
+    except (KeyError, ValueError):
+        raise ValueError("unknown date format: %r" % raw) from None
+
+
+def parse_timestamps(values):
+    # parse a whole column into datetime64[s], each distinct string only once
+    values = list(values)
+    seconds = {raw: (parse_timestamp(raw) - EPOCH) // ONE_SECOND for raw in set(values)}
+    return np.fromiter(
+        map(seconds.__getitem__, values), dtype=np.int64, count=len(values)
+    ).view("datetime64[s]")
@@ -1,16 +1,50 @@
 import logging
+import os
 import sys
 from ast import literal_eval
 from datetime import datetime
 
-import geopy.distance
 import pandas as pd
 
+from distance import POINT_MODELS
+
 
 class settings:
     # LOG filename
     filename = "sample_log"
 
+    # For reading logs: bytes per read and records per batch
+    READ_BUFFER = 1 << 16
+    BATCH_SIZE = 10000
+
+    # READ_BUFFER blocks of a compressed log decompressed ahead of parsing
+    DECOMPRESS_QUEUE = 64
+
+    # Bytes of log each worker parses at a time with --parse-jobs
+    PARSE_CHUNK = 16 << 20
+
+    # Opt-in cache of parsed columns (--cache), bounded to CACHE_SIZE bytes
+    CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "checklog")
+    CACHE_SIZE = 1 << 30
+
+    # Findings a --format sink holds before writing them out
+    FINDINGS_BUFFER = 1000
+
+    # Ingestion server (server.py): rows waiting for analysis before readers
+    # stop reading from their sockets, and the longest line accepted
+    SERVER_PORT = 9000
+    SERVER_QUEUE = 10000
+    SERVER_LINE = 1 << 16
+
+    # Seconds between polls of a followed log
+    FOLLOW_INTERVAL = 0.5
+
+    # Distinct raw timestamp strings remembered by the parser
+    TIMESTAMP_CACHE = 4096
+
+    # Distance model: "ellipsoidal" (matches geopy's geodesic) or "haversine"
+    DISTANCE_MODEL = "ellipsoidal"
+
     # Detect movement
     MOVE_SPEED = 10 / 3600  # 10 miles/hour = 10/3600 miles/sec
     MOVE_TIME = 3600  # for checking idle status
@@ -34,6 +68,10 @@ class settings:
     # For getting running intervals
     IDLE_TIME = 900
 
+    # Seconds of log read before --from, so that the check windows are full
+    # when the range starts
+    LEAD_IN = max(MOVE_TIME, TRIGGER_TIME, IDLE_TIME, BATTERY_TIME, UPLOAD_TIME)
+
     # define different log states
     idle_state = [
         "idle",
@@ -64,12 +102,16 @@ def setcolor(color, str):
     return clr + str + colors.ENDC
 
 
-def logger(classes, str):
+def log_line(classes, str):
     if classes == "Performance":
         log_level = colors.GREEN
     else:
         log_level = colors.RED
-    print("[" + log_level + classes + colors.ENDC + "] " + str)
+    return "[" + log_level + classes + colors.ENDC + "] " + str
+
+
+def logger(classes, str):
+    print(log_line(classes, str))
 
 
 def time_delta(dateobj1, dateobj2):
@@ -77,65 +119,99 @@ def time_delta(dateobj1, dateobj2):
     return abs((dateobj1 - dateobj2).total_seconds())
 
 
+def hop(last, row, prev):
+    # miles from one member row of a window or list to the next: the
+    # segment of `row` when `last` is the row right before it (its `prev`),
+    # measured between the two locations otherwise
+    if last is prev:
+        return row.segment
+    model = POINT_MODELS[settings.DISTANCE_MODEL]
+    return model(*last.location, *row.location)
+
+
+def average_speed(first, last, miles):
+    # miles/sec over `miles` travelled from the first row to the last
+    time = abs(last.timestamp - first.timestamp)
+    if time == 0:
+        time = 1  # prevent divide by zero
+    return miles / time
+
+
+class SlidingWindow:
+    # time windows of `span` seconds, each one opened by the first row that
+    # falls outside the previous window. Windows start in time order, so a
+    # row outside the newest window is outside every older one too: older
+    # windows are evicted as soon as a new one opens and each row is only
+    # kept as the start or end of the newest window. Its distance is summed
+    # over the hops between member rows as they are inserted.
+    def __init__(self, span):
+        self.span = span
+        self.clear()
+
+    def clear(self):
+        self.start = None
+        self.last = None
+        self.rows = 0
+        self.miles = 0.0
+
+    def insert(self, row, prev=None):
+        if self.start is None or abs(row.timestamp - self.start.timestamp) >= self.span:
+            # out of range, open a new window
+            self.start = row
+            self.rows = 0
+            self.miles = 0.0
+        else:
+            self.miles += hop(self.last, row, prev)
+        self.last = row
+        self.rows += 1
+
+    def speed(self):
+        return average_speed(self.start, self.last, self.miles)
+
+
 class RunList:
     # check avg speed when is in running state
     def __init__(self):
-        self.run_list = []
+        self.first = None
+        self.last = None
+        self.miles = 0.0
 
-    def add(self, current):
-        self.run_list.append(current)
+    def add(self, current, prev=None):
+        if self.first is None:
+            self.first = current
+        else:
+            self.miles += hop(self.last, current, prev)
+        self.last = current
 
     def summary(self):
         stop_pos = None
         avg_speed = -1
-        if len(self.run_list) > 1:
-            # get running time
-            time = time_delta(
-                self.run_list[0]["Date(UTC+0)"], self.run_list[-1]["Date(UTC+0)"]
-            )
-            if time == 0:
-                time = 1
-
-            # get moved distance
-            dist = 0
-            for i in range(1, len(self.run_list)):
-                dist += geopy.distance.distance(
-                    self.run_list[i]["Location(Lat,Lng)"],
-                    self.run_list[i - 1]["Location(Lat,Lng)"],
-                ).miles
-            avg_speed = dist / time
+        if self.last is not self.first:
+            avg_speed = average_speed(self.first, self.last, self.miles)
             if avg_speed < settings.MOVE_SPEED:
-                stop_pos = self.run_list[-1]
+                stop_pos = self.last
         return stop_pos, avg_speed
 
 
 class IdleList:
     def __init__(self):
-        self.idle_list = []
+        self.first = None
+        self.last = None
+        self.miles = 0.0
 
-    def add(self, current):
-        self.idle_list.append(current)
+    def add(self, current, prev=None):
+        if self.first is None:
+            self.first = current
+        else:
+            self.miles += hop(self.last, current, prev)
+        self.last = current
 
     def summary(self):
         start_pos = None
         avg_speed = -1
-        if len(self.idle_list) > 1:
+        if self.last is not self.first:
             # get avg speed while in idle state
-            time = time_delta(
-                self.idle_list[0]["Date(UTC+0)"], self.idle_list[-1]["Date(UTC+0)"]
-            )
-            if time == 0:
-                time = 1
-            dist = 0
-            for i in range(1, len(self.idle_list)):
-                dist += geopy.distance.distance(
-                    self.idle_list[i]["Location(Lat,Lng)"],
-                    self.idle_list[i - 1]["Location(Lat,Lng)"],
-                ).miles
-            avg_speed = dist / time
-
+            avg_speed = average_speed(self.first, self.last, self.miles)
             if avg_speed >= settings.MOVE_SPEED:
-                start_pos = self.idle_list[-1]
-
+                start_pos = self.last
         return start_pos, avg_speed
-